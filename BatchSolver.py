@@ -0,0 +1,305 @@
+# Written by William Dinauer
+# CS74 Fall 2022
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+from ConstraintSatisfactionProblem import ConstraintSatisfactionProblem
+from MapProblem import MapProblem
+from BitMapProblem import BitMapProblem
+from CircuitProblem import CircuitProblem
+from GraphLoader import load_graph
+
+
+# Yield the instance descriptions of source, with their position in it: a path to a JSONL file (read one line at a
+# time, blank lines skipped) or an iterable of descriptions, each a dictionary or a JSON string. JSON is decoded by
+# the workers, so a bad line only fails its own instance
+def read_instances(source):
+    if isinstance(source, str):
+        with open(source, "r") as f:
+            index = 0
+            for line in f:
+                if len(line.strip()) > 0:
+                    yield index, line
+                    index += 1
+        return
+    index = 0
+    for description in source:
+        yield index, description
+        index += 1
+
+
+# Build the problem an instance describes. Map coloring instances have "kind" "map" (or "bitmap" for
+# BitMapProblem), "colors" (a list of colors or their number) and a graph given by one of "graph" (a dictionary of
+# neighbour lists, edges listed from either end), "edges" (a list of [u, v] pairs, with "vertices" listing isolated
+# ones) or "path" (a file read with GraphLoader.load_graph). Circuit instances have "kind" "circuit" (or "vector"
+# for VectorCircuitProblem), "m", "n", "components" and optionally "symmetry". Returns (problem, relabel), where
+# relabel maps a solution of the problem back to the labels of the description.
+# Vertex labels are turned into strings, since the keys of a JSON object (the "graph" form, and the solution that
+# is written) always are: 0 and "0" are the same vertex
+def build_problem(description):
+    kind = description.get("kind", "map")
+    if kind in ["circuit", "vector"]:
+        if kind == "vector":
+            # NumPy is only needed for vector circuits
+            from VectorCircuitProblem import VectorCircuitProblem
+            problem = VectorCircuitProblem(description["m"], description["n"], description["components"],
+                                           description.get("symmetry", False))
+        else:
+            problem = CircuitProblem(description["m"], description["n"], description["components"],
+                                     description.get("symmetry", False))
+        return problem, None
+    if kind not in ["map", "bitmap"]:
+        raise ValueError("unknown instance kind " + repr(kind))
+    colors = description["colors"]
+    if isinstance(colors, int):
+        colors = list(range(colors))
+    relabel = None
+    if "path" in description:
+        graph = load_graph(description["path"])
+        relabel = graph.relabel
+    else:
+        graph = {}
+        for var in description.get("vertices", []):
+            graph[str(var)] = set()
+        if "graph" in description:
+            for var, neighbours in description["graph"].items():
+                var = str(var)
+                graph.setdefault(var, set())
+                for adj in neighbours:
+                    adj = str(adj)
+                    if adj != var:
+                        graph[var].add(adj)
+                        graph.setdefault(adj, set()).add(var)
+        for u, v in description.get("edges", []):
+            u = str(u)
+            v = str(v)
+            graph.setdefault(u, set())
+            graph.setdefault(v, set())
+            if u != v:
+                graph[u].add(v)
+                graph[v].add(u)
+    if kind == "bitmap":
+        return BitMapProblem(graph, colors), relabel
+    return MapProblem(graph, colors), relabel
+
+
+# A solution in a form JSON can hold: colors by label for map coloring, and the [position, rotation] of every
+# component, in order, for circuits
+def encode_solution(problem, solution, relabel):
+    if solution is None:
+        return None
+    if isinstance(problem, CircuitProblem):
+        placements = []
+        for var in range(problem.num_variables):
+            placements.append(solution[var])
+        return placements
+    if relabel is not None:
+        return relabel(solution)
+    return solution
+
+
+# The id of an instance in the results: its own "id", or its position in the input
+def instance_id(index, description):
+    if isinstance(description, str):
+        try:
+            description = json.loads(description)
+        except ValueError:
+            return index
+    if isinstance(description, dict):
+        return description.get("id", index)
+    return index
+
+
+# Solve one instance. options are the ConstraintSatisfactionProblem keyword arguments, which the instance's own
+# "options" add to, and time_limit is used unless the instance has its own "time_limit". Never raises: a bad
+# instance gives a result with status "error"
+def solve_instance(index, description, options, time_limit):
+    start = time.perf_counter()
+    result = {"id": index}
+    try:
+        if isinstance(description, str):
+            description = json.loads(description)
+        result["id"] = instance_id(index, description)
+        configuration = dict(options)
+        configuration.update(description.get("options", {}))
+        configuration["time_limit"] = description.get("time_limit", time_limit)
+        problem, relabel = build_problem(description)
+        solved = ConstraintSatisfactionProblem(problem, **configuration).solve()
+        result["status"] = solved.status
+        result["solution"] = encode_solution(problem, solved.solution, relabel)
+        result["statistics"] = solved.statistics
+    except Exception as error:
+        result["status"] = "error"
+        result["error"] = repr(error)
+    result["time"] = time.perf_counter() - start
+    return result
+
+
+# Solve a chunk of (index, description) pairs in a worker process, returning their results
+def solve_chunk(chunk, options, time_limit):
+    results = []
+    for index, description in chunk:
+        results.append(solve_instance(index, description, options, time_limit))
+    return results
+
+
+# Solves many independent instances (see build_problem() for their descriptions) and writes one JSON line per
+# instance, with its "id" (the instance's own, or its position in the input), "status" (a SearchResult status, or
+# "error"), "solution", "statistics" and "time" (seconds spent building and solving it). Instances are sent to
+# processes workers in chunks of chunksize, and results are written as soon as their chunk is done, so they come
+# out in the order they finish. At most window chunks are in flight and the input is read only as chunks are sent,
+# so memory stays bounded however many instances there are. time_limit (in seconds) bounds every instance that
+# does not set its own; it stops the search, not the building of the problem. A worker that dies breaks the pool
+# and every chunk in flight with it: those instances are then solved again one at a time, so only the one that
+# kills its worker gets an "error" line, and the batch goes on with a new pool. With processes=1, instances are
+# solved in this process
+class BatchSolver:
+
+    def __init__(self, processes=None, chunksize=4, window=None, time_limit=None, options=None):
+        if processes is None:
+            processes = os.cpu_count() or 1
+        self.processes = processes
+        self.chunksize = chunksize
+        if window is None:
+            window = 2 * processes
+        self.window = window
+        self.time_limit = time_limit
+        if options is None:
+            options = {}
+        self.options = options
+        # Number of results written with each status by the last run
+        self.counts = {}
+
+    # Solve every instance of source (see read_instances()) and write the results to output, a path or a file
+    # object. Returns the number of results with each status
+    def run(self, source, output):
+        self.counts = {}
+        if isinstance(output, str):
+            with open(output, "w") as f:
+                self.solve_all(source, f)
+        else:
+            self.solve_all(source, output)
+        return self.counts
+
+    def solve_all(self, source, output):
+        instances = read_instances(source)
+        if self.processes == 1:
+            for index, description in instances:
+                self.write(output, [solve_instance(index, description, self.options, self.time_limit)])
+            return
+        executor = ProcessPoolExecutor(self.processes)
+        try:
+            pending = {}
+            exhausted = False
+            while True:
+                # Keep the window full, reading the input only as far as needed
+                while not exhausted and len(pending) < self.window:
+                    chunk = self.next_chunk(instances)
+                    if len(chunk) == 0:
+                        exhausted = True
+                        break
+                    future = executor.submit(solve_chunk, chunk, self.options, self.time_limit)
+                    pending[future] = chunk
+                if len(pending) == 0:
+                    return
+                broken = self.collect(output, wait(pending.keys(), return_when=FIRST_COMPLETED).done, pending)
+                if len(broken) > 0:
+                    # A worker died (killed, or out of memory) and the pool fails every chunk still in flight, so
+                    # wait for all of them, then retry the failed ones
+                    broken.extend(self.collect(output, pending.keys(), pending))
+                    executor.shutdown()
+                    self.isolate(output, broken)
+                    executor = ProcessPoolExecutor(self.processes)
+        finally:
+            executor.shutdown()
+
+    # Wait for the given futures and write their results, removing them from pending. Returns the chunks whose futures
+    # failed because the pool broke
+    def collect(self, output, futures, pending):
+        broken = []
+        for future in list(wait(futures).done):
+            chunk = pending.pop(future)
+            try:
+                results = future.result()
+            except BrokenProcessPool:
+                broken.append(chunk)
+                continue
+            except Exception as error:
+                results = self.failed(chunk, error)
+            self.write(output, results)
+        return broken
+
+    # Solve the instances of chunks one at a time in a pool of one worker, so an instance that kills its worker
+    # only fails itself. The pool is made again after every such instance
+    def isolate(self, output, chunks):
+        executor = None
+        try:
+            for chunk in chunks:
+                for item in chunk:
+                    if executor is None:
+                        executor = ProcessPoolExecutor(1)
+                    try:
+                        results = executor.submit(solve_chunk, [item], self.options, self.time_limit).result()
+                    except Exception as error:
+                        results = self.failed([item], error)
+                        if isinstance(error, BrokenProcessPool):
+                            executor.shutdown()
+                            executor = None
+                    self.write(output, results)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    # "error" results for the instances of a chunk that could not be solved
+    def failed(self, chunk, error):
+        results = []
+        for index, description in chunk:
+            results.append({"id": instance_id(index, description), "status": "error", "error": repr(error)})
+        return results
+
+    # The next chunksize instances
+    def next_chunk(self, instances):
+        chunk = []
+        for item in instances:
+            chunk.append(item)
+            if len(chunk) == self.chunksize:
+                break
+        return chunk
+
+    # Write results as JSON lines, flushing them so they can be read while the batch is still running
+    def write(self, output, results):
+        for result in results:
+            output.write(json.dumps(result) + "\n")
+            self.counts[result["status"]] = self.counts.get(result["status"], 0) + 1
+        output.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve a batch of map coloring and circuit instances")
+    parser.add_argument("instances", help="JSONL file with one instance description per line")
+    parser.add_argument("output", help="JSONL file to write the results to ('-' for standard output)")
+    parser.add_argument("--processes", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--chunksize", type=int, default=4, help="instances sent to a worker at a time")
+    parser.add_argument("--window", type=int, help="chunks in flight at once (default: twice the processes)")
+    parser.add_argument("--time-limit", type=float, help="seconds allowed per instance")
+    parser.add_argument("--options", default="{}", help="solver keyword arguments, as a JSON object")
+    args = parser.parse_args(argv)
+
+    solver = BatchSolver(args.processes, args.chunksize, args.window, args.time_limit, json.loads(args.options))
+    if args.output == "-":
+        counts = solver.run(args.instances, sys.stdout)
+    else:
+        counts = solver.run(args.instances, args.output)
+    for status in sorted(counts.keys()):
+        print("%s: %d" % (status, counts[status]), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
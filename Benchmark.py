@@ -0,0 +1,370 @@
+# Written by William Dinauer
+# CS74 Fall 2022
+
+import argparse
+import ast
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import random
+import sys
+import time
+import tracemalloc
+
+from ConstraintSatisfactionProblem import ConstraintSatisfactionProblem
+from MapProblem import MapProblem
+from CircuitProblem import CircuitProblem
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+# The search settings every instance is run with: every heuristic, with and without LCV and inference
+HEURISTICS = [None, "MRV", "Degree", "dom/wdeg"]
+QUICK_HEURISTICS = ["MRV", "Degree"]
+
+
+# The large graph from Testing.py, read without running the script
+def load_large_graph(path=None):
+    if path is None:
+        path = os.path.join(DIRECTORY, "Testing.py")
+    with open(path, "r") as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and getattr(node.targets[0], "id", None) == "large_graph":
+            return ast.literal_eval(node.value)
+    raise ValueError("no large_graph in " + path)
+
+
+# The USA map graph, read from USA_Map.txt in the same way as USA_Map_Test.py
+def load_usa_map(path=None):
+    if path is None:
+        path = os.path.join(DIRECTORY, "USA_Map.txt")
+    num = {}
+    lines = []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if len(line) == 0:
+                continue
+            states = line.split(",")
+            num[states[0]] = len(num)
+            lines.append(states)
+    graph = {}
+    for states in lines:
+        graph[num[states[0]]] = set()
+        for adj in states[1:]:
+            graph[num[states[0]]].add(num[adj])
+    return graph
+
+
+# Random graph with n vertices and about n*degree/2 edges. A coloring with the given number of colors is chosen
+# first and only edges between vertices of different colors are added, so the graph is always colorable
+def random_graph(n, degree, colors, seed):
+    rng = random.Random(seed)
+    graph = {}
+    planted = {}
+    for var in range(n):
+        graph[var] = set()
+        planted[var] = rng.randrange(colors)
+    edges = int(n * degree / 2)
+    while edges > 0:
+        var = rng.randrange(n)
+        adj = rng.randrange(n)
+        if planted[var] != planted[adj] and adj not in graph[var]:
+            graph[var].add(adj)
+            graph[adj].add(var)
+            edges -= 1
+    return graph
+
+
+# Planar graph: a side x side grid where every cell gets one of its diagonals at random, and a few edges are
+# then dropped. Such graphs are always 4-colorable
+def planar_graph(side, seed, drop=0.1):
+    rng = random.Random(seed)
+    graph = {}
+    for var in range(side * side):
+        graph[var] = set()
+    edges = []
+    for r in range(side):
+        for c in range(side):
+            var = r*side + c
+            if c+1 < side:
+                edges.append((var, var+1))
+            if r+1 < side:
+                edges.append((var, var+side))
+            if r+1 < side and c+1 < side:
+                if rng.random() < 0.5:
+                    edges.append((var, var+side+1))
+                else:
+                    edges.append((var+1, var+side))
+    for var, adj in edges:
+        if rng.random() >= drop:
+            graph[var].add(adj)
+            graph[adj].add(var)
+    return graph
+
+
+# Components for an m x n board, made by cutting the board into pieces rectangles and leaving one out, so the
+# board always has a solution
+def random_circuit(m, n, pieces, seed):
+    rng = random.Random(seed)
+    rectangles = [(m, n)]
+    while len(rectangles) < pieces:
+        # Cut the largest rectangle at a random point along its longer side
+        rectangles.sort(key=lambda size: size[0] * size[1])
+        height, width = rectangles.pop()
+        if height == 1 and width == 1:
+            rectangles.append((height, width))
+            break
+        if width >= height:
+            cut = rng.randint(1, width-1)
+            rectangles.append((height, cut))
+            rectangles.append((height, width-cut))
+        else:
+            cut = rng.randint(1, height-1)
+            rectangles.append((cut, width))
+            rectangles.append((height-cut, width))
+    rng.shuffle(rectangles)
+    rectangles.pop()
+    variables = []
+    for i in range(len(rectangles)):
+        height, width = rectangles[i]
+        character = chr(ord('a') + i % 26)
+        variables.append([character * width] * height)
+    return variables
+
+
+# The instances to run, as (name, kind, arguments) specs. kind and arguments are passed to build_instance
+def instances(quick=False):
+    specs = [("large_graph", "large", ()),
+             ("usa_map", "usa", ()),
+             ("circuit_demo", "circuit", (3, 10, [['aaa', 'aaa'], ['bbbbb', 'bbbbb'], ['cc', 'cc', 'cc'],
+                                                  ['eeeeeee']]))]
+    sizes = [100, 200, 400]
+    sides = [10, 20, 40]
+    boards = [(4, 6, 8), (6, 8, 12), (8, 10, 16)]
+    if quick:
+        sizes = sizes[:2]
+        sides = sides[:2]
+        boards = boards[:2]
+    for n in sizes:
+        specs.append(("random_%d" % n, "random", (n, 3.5, 3, n)))
+    for side in sides:
+        specs.append(("planar_%d" % (side*side), "planar", (side, 4, side)))
+    for m, n, pieces in boards:
+        specs.append(("circuit_%dx%d" % (m, n), "circuit", (m, n, random_circuit(m, n, pieces, m*n))))
+    return specs
+
+
+# Build the problem for a spec. Returns (problem, iterative): generated graphs can be deeper than the recursion
+# limit, so they are searched with the iterative engine
+def build_instance(kind, arguments):
+    if kind == "large":
+        return MapProblem(load_large_graph(), [0, 1, 2, 3]), False
+    if kind == "usa":
+        return MapProblem(load_usa_map(), [0, 1, 2, 3]), False
+    if kind == "random":
+        n, degree, colors, seed = arguments
+        return MapProblem(random_graph(n, degree, colors, seed), list(range(colors))), True
+    if kind == "planar":
+        side, colors, seed = arguments
+        return MapProblem(planar_graph(side, seed), list(range(colors))), True
+    if kind == "circuit":
+        m, n, variables = arguments
+        return CircuitProblem(m, n, variables), False
+    raise ValueError("unknown instance kind " + kind)
+
+
+# Every combination of heuristic, LCV and inference
+def settings_matrix(quick=False):
+    heuristics = HEURISTICS
+    if quick:
+        heuristics = QUICK_HEURISTICS
+    settings = []
+    for heuristic in heuristics:
+        for lcv in [False, True]:
+            for inference in [False, True]:
+                settings.append({"heuristic": heuristic, "lcv": lcv, "inference": inference})
+    return settings
+
+
+# Returns True if the assignment is a complete solution of the problem
+def valid(csp, asgnmnt):
+    if len(asgnmnt) != len(csp.graph):
+        return False
+    if isinstance(csp, CircuitProblem):
+        occupied = 0
+        for var in asgnmnt:
+            mask = csp.mask(var, asgnmnt[var])
+            if mask is None or mask & occupied:
+                return False
+            occupied |= mask
+        return True
+    for var in csp.graph:
+        for adj in csp.graph[var]:
+            if asgnmnt[var] == asgnmnt[adj]:
+                return False
+    return True
+
+
+# Run one search, returning its result and the solver
+def search(kind, arguments, settings, seed):
+    csp, iterative = build_instance(kind, arguments)
+    solver = ConstraintSatisfactionProblem(csp, iterative=iterative, seed=seed, **settings)
+    return csp, solver, solver.backtracking_search()
+
+
+# Worker process for one case. The search is timed first and its result sent, then (if memory is set) it is run
+# again under tracemalloc, which slows it down too much to time it at the same time, and the peak memory is sent
+# on its own. The search is seeded, so both runs are the same
+def run_case(kind, arguments, settings, seed, memory, results):
+    try:
+        start = time.perf_counter()
+        csp, solver, asgnmnt = search(kind, arguments, settings, seed)
+        elapsed = time.perf_counter() - start
+        if asgnmnt is False:
+            status = "unsat"
+        elif valid(csp, asgnmnt):
+            status = "solved"
+        else:
+            status = "invalid"
+        result = {"status": status, "time": elapsed, "nodes": solver.nodes, "backtracks": solver.backtracks,
+                  "peak_memory": None, "statistics": solver.statistics()}
+    except Exception as error:
+        results.put({"status": "error", "error": repr(error)})
+        return
+    results.put(result)
+    if memory:
+        peak = None
+        tracemalloc.start()
+        try:
+            search(kind, arguments, settings, seed)
+            peak = tracemalloc.get_traced_memory()[1]
+        except Exception:
+            pass
+        finally:
+            tracemalloc.stop()
+        results.put(peak)
+
+
+# Run one case in its own process, so it can be stopped after timeout seconds and its memory use is its own. The
+# memory pass gets another timeout seconds of its own: if it runs out, the case only loses its peak_memory
+def run(spec, settings, seed=0, timeout=30, memory=True):
+    name, kind, arguments = spec
+    results = multiprocessing.Queue()
+    worker = multiprocessing.Process(target=run_case, args=(kind, arguments, settings, seed, memory, results))
+    worker.start()
+    result = None
+    try:
+        result = results.get(timeout=timeout)
+        if memory and result["status"] != "error":
+            result["peak_memory"] = results.get(timeout=timeout)
+    except queue.Empty:
+        if result is None:
+            result = {"status": "timeout", "time": None, "nodes": None, "backtracks": None, "peak_memory": None}
+        worker.terminate()
+    worker.join()
+    result["instance"] = name
+    result["settings"] = settings
+    return result
+
+
+# Run every setting on every instance and return the report
+def run_all(specs, matrix, seed=0, timeout=30, memory=True, verbose=True):
+    results = []
+    for spec in specs:
+        for settings in matrix:
+            result = run(spec, settings, seed, timeout, memory)
+            results.append(result)
+            if verbose:
+                print(format_result(result))
+                sys.stdout.flush()
+    return {"python": platform.python_version(), "platform": platform.platform(), "seed": seed,
+            "timeout": timeout, "created": time.strftime("%Y-%m-%d %H:%M:%S"), "results": results}
+
+
+# One line summary of a result
+def format_result(result):
+    settings = result["settings"]
+    label = "%-14s %-8s lcv=%-5s inf=%-5s" % (result["instance"], settings["heuristic"], settings["lcv"],
+                                             settings["inference"])
+    if result.get("time") is None:
+        return "%s %-8s" % (label, result["status"])
+    memory = ""
+    if result.get("peak_memory") is not None:
+        memory = "%8.2f MiB" % (result["peak_memory"] / 1048576)
+    return "%s %-8s %9.4fs %9d nodes %9d backtracks %s" % (label, result["status"], result["time"],
+                                                            result["nodes"], result["backtracks"], memory)
+
+
+# The key matching a result with the same case in another report
+def case_key(result):
+    return result["instance"], json.dumps(result["settings"], sort_keys=True)
+
+
+# Compare a report against a baseline report. A case regresses if it finished in the baseline but not with the
+# same status now, or if its time, nodes or peak memory grew by more than threshold times (times under min_time
+# seconds are ignored as noise). Returns a list of messages, one per regression
+def compare(report, baseline, threshold=1.25, min_time=0.1):
+    previous = {}
+    for result in baseline["results"]:
+        previous[case_key(result)] = result
+    regressions = []
+    for result in report["results"]:
+        key = case_key(result)
+        if key not in previous:
+            continue
+        old = previous[key]
+        label = "%s %s" % key
+        if old["status"] in ["solved", "unsat"] and result["status"] != old["status"]:
+            regressions.append("%s: status %s -> %s" % (label, old["status"], result["status"]))
+            continue
+        if result.get("time") is None or old.get("time") is None:
+            continue
+        if result["time"] > max(old["time"], min_time) * threshold:
+            regressions.append("%s: time %.4fs -> %.4fs" % (label, old["time"], result["time"]))
+        for field in ["nodes", "backtracks", "peak_memory"]:
+            if result.get(field) is not None and old.get(field) is not None and \
+                    result[field] > max(old[field], 1) * threshold:
+                regressions.append("%s: %s %d -> %d" % (label, field, old[field], result[field]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the constraint satisfaction solver")
+    parser.add_argument("--quick", action="store_true", help="fewer heuristics and smaller generated instances")
+    parser.add_argument("--instances", nargs="*", help="only run the instances with these names")
+    parser.add_argument("--output", help="write the report to this JSON file")
+    parser.add_argument("--baseline", help="flag regressions against this JSON report")
+    parser.add_argument("--threshold", type=float, default=1.25, help="allowed growth ratio before flagging")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds allowed per case")
+    parser.add_argument("--seed", type=int, default=0, help="solver seed used for every case")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run of every case")
+    args = parser.parse_args(argv)
+
+    specs = instances(args.quick)
+    if args.instances:
+        selected = []
+        for spec in specs:
+            if spec[0] in args.instances:
+                selected.append(spec)
+        specs = selected
+    report = run_all(specs, settings_matrix(args.quick), args.seed, args.timeout, not args.no_memory)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for message in regressions:
+            print("REGRESSION " + message)
+        if len(regressions) > 0:
+            return 1
+        print("No regressions against " + args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+# Written by William Dinauer
+# CS74 Fall 2022
+
+from MapProblem import MapProblem
+
+
+# Map coloring problem that stores every domain as an int bitmask, where bit i is set if domain_values[i] is still
+# a legal color. Removal, emptiness and support checks are single bit operations, and a domain takes one int
+# instead of a set, which keeps graphs with hundreds of thousands of vertices manageable
+class BitMapProblem(MapProblem):
+
+    def __init__(self, graph, domain_values):
+        super().__init__(graph, domain_values)
+        # Map every color to its bit
+        self.bits = {}
+        for i in range(len(domain_values)):
+            self.bits[domain_values[i]] = 1 << i
+        self.full = (1 << len(domain_values)) - 1
+
+    def initialize_domains(self):
+        # Every domain starts with every bit set, except for restricted variables
+        domains = dict.fromkeys(self.graph.keys(), self.full)
+        for var in self.allowed:
+            domains[var] = self.initial_domain(var)
+        return domains
+
+    def initial_domain(self, var):
+        if var not in self.allowed:
+            return self.full
+        domain = 0
+        for val in self.allowed[var]:
+            domain |= self.bits[val]
+        return domain
+
+    def domain_size(self, domain):
+        return domain.bit_count()
+
+    # Domains are ints, so they are their own keys
+    def domain_key(self, domain):
+        return domain
+
+    # Colors are returned in the order of domain_values
+    def domain_list(self, domain):
+        values = []
+        while domain:
+            low = domain & -domain
+            values.append(self.domain_values[low.bit_length() - 1])
+            domain ^= low
+        return values
+
+    def in_domain(self, val, domain):
+        return domain & self.bits[val] != 0
+
+    def prune(self, var, values, domains, trail=None):
+        if trail is not None:
+            trail.save(domains, var)
+        for val in values:
+            domains[var] &= ~self.bits[val]
+
+    # adj is supported as long as it has some color other than val
+    def constrained(self, var, val, adj, domains):
+        return domains[adj] & ~self.bits[val] != 0
+
+    def support(self, var, val, adj, domains):
+        rest = domains[adj] & ~self.bits[val]
+        if rest == 0:
+            return None
+        return self.domain_values[(rest & -rest).bit_length() - 1]
+
+    # Clear the bit of the assigned color in every adjacent domain
+    def update_domains(self, var, asgnmnt, domains, trail=None):
+        bit = self.bits[asgnmnt[var]]
+        for adj in self.graph[var]:
+            if domains[adj] & bit:
+                if trail is not None:
+                    trail.save(domains, adj)
+                domains[adj] ^= bit
+        return domains
+
+    def numeric_overlap(self, var, adj, asgnmnt, domains):
+        if domains[adj] & self.bits[asgnmnt[var]]:
+            return -1
+        return 0
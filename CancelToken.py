@@ -0,0 +1,18 @@
+# Written by William Dinauer
+# CS74 Fall 2022
+
+import threading
+
+
+# Cooperative cancellation for a search running in another thread. The solver polls cancelled() every few hundred
+# nodes, so cancel() takes effect shortly after it is called, and the search then ends with the "cancelled" status
+class CancelToken:
+
+    def __init__(self):
+        self.event = threading.Event()
+
+    def cancel(self):
+        self.event.set()
+
+    def cancelled(self):
+        return self.event.is_set()
@@ -1,9 +1,15 @@
 # Written by William Dinauer
 # CS74 Fall 2022
 
+import hashlib
+
+
 class CircuitProblem:
 
-    def __init__(self, m, n, variables):
+    # With symmetry, components of the same shape (the same width and height, in either orientation) are
+    # interchangeable, so they are required to be placed in increasing order of their covered cells. Only one of
+    # the permutations of every solution is then searched
+    def __init__(self, m, n, variables, symmetry=False):
         self.m = m
         self.n = n
         self.variables = variables
@@ -34,165 +40,257 @@ class CircuitProblem:
                 if adj != var:
                     self.graph[var].append(adj)
 
+        # Precompute a bitmask of the covered board cells for every component and placement, indexed by
+        # position*2 + rotation. Overlap tests between two placements are then a single '&'
+        self.masks = {}
+        for var in range(self.num_variables):
+            self.masks[var] = self.build_masks(var)
+
+        # Components with the same shape as each component, and the key of every placement: position*2, plus 1 if
+        # the component is placed wider than it is tall. Placements of same-shaped components cover the same cells
+        # exactly when they have the same key
+        self.symmetry = symmetry
+        self.same_shape = {}
+        self.keys = {}
+        for var in range(self.num_variables):
+            self.same_shape[var] = set()
+            if symmetry:
+                for adj in range(self.num_variables):
+                    if adj != var and self.shape(adj) == self.shape(var):
+                        self.same_shape[var].add(adj)
+            self.keys[var] = self.build_keys(var)
+
+    # Add a component to a problem that may already be solved. Returns the variables whose constraints changed,
+    # for repair(): only the new one, since the placements of the others still fit together
+    def add_component(self, component):
+        var = self.num_variables
+        # The list of components may belong to the caller, so it is copied rather than extended
+        self.variables = self.variables + [component]
+        self.num_variables += 1
+        self.y[var] = len(component)
+        self.x[var] = len(component[0])
+        self.graph[var] = []
+        for adj in range(var):
+            self.graph[adj].append(var)
+            self.graph[var].append(adj)
+        self.masks[var] = self.build_masks(var)
+        self.same_shape[var] = set()
+        if self.symmetry:
+            for adj in range(var):
+                if self.shape(adj) == self.shape(var):
+                    self.same_shape[var].add(adj)
+                    self.same_shape[adj].add(var)
+        self.keys[var] = self.build_keys(var)
+        return [var]
+
+    # The masks of every placement of component var, indexed by position*2 + rotation
+    def build_masks(self, var):
+        masks = []
+        for pair in self.domain_values:
+            masks.append(self.build_mask(var, pair[0], pair[1]))
+        return masks
+
+    # The keys of every placement of component var, indexed by position*2 + rotation
+    def build_keys(self, var):
+        keys = []
+        for pair in self.domain_values:
+            if pair[1] == 0:
+                wide = self.x[var] > self.y[var]
+            else:
+                wide = self.y[var] > self.x[var]
+            keys.append(pair[0]*2 + int(wide))
+        return keys
+
+    # The dimensions of component var, smallest first
+    def shape(self, var):
+        return min(self.x[var], self.y[var]), max(self.x[var], self.y[var])
+
+    # Return False if placing var at pair and adj at adj_pair breaks the order between same-shaped components
+    def ordered(self, var, pair, adj, adj_pair):
+        if adj not in self.same_shape[var]:
+            return True
+        key = self.keys[var][pair[0]*2 + pair[1]]
+        adj_key = self.keys[adj][adj_pair[0]*2 + adj_pair[1]]
+        if var < adj:
+            return key < adj_key
+        return key > adj_key
+
+    # Return the bitmask of cells covered by component var at position pos with the given rotation, or None if
+    # the component does not fit on the board there
+    def build_mask(self, var, pos, rotation):
+        start_x, start_y = self.pos_to_xy[pos]
+        if rotation == 0:
+            var_x = self.x[var]
+            var_y = self.y[var]
+        else:
+            var_x = self.y[var]
+            var_y = self.x[var]
+        if start_x+var_x > self.n or start_y+var_y > self.m:
+            return None
+        # Bit r*n+c is set if the cell at row r and column c is covered
+        row = (1 << var_x) - 1
+        mask = 0
+        for r in range(start_y, start_y+var_y):
+            mask |= row << (r*self.n + start_x)
+        return mask
+
+    # The precomputed bitmask for component var placed at pair = [position, rotation]
+    def mask(self, var, pair):
+        return self.masks[var][pair[0]*2 + pair[1]]
+
     # Create the initial domain for each variable, returned as a dictionary mapping variables to their domain
     def initialize_domains(self):
         domains = {}
         for var in range(self.num_variables):
-            domains[var] = []
-            # Try every domain position and rotation
-            for pair in self.domain_values:
-                val = pair[0]
-                rotation = pair[1]
-                x, y = self.pos_to_xy[val]
-                # If valid, add this pair to the domain for the variable
-                if rotation == 0 and x+self.x[var]-1 < self.n and y+self.y[var]-1 < self.m:
-                    domains[var].append(pair)
-                elif rotation == 1 and x+self.y[var]-1 < self.n and y+self.x[var]-1 < self.m:
-                    domains[var].append(pair)
+            domains[var] = self.initial_domain(var)
         return domains
 
-    # Updates the domains based on the constraints
-    def update_domains(self, var, asgnmnt, domains):
-        pair = asgnmnt[var]
-        start = pair[0]
-        rotation = pair[1]
-        # Start x and y is the bottom left corner of our component
-        start_x, start_y = self.pos_to_xy[start]
-        # set var_x and var_y based on the rotation (how long/tall our component is)
-        var_x = self.x[var]
-        var_y = self.y[var]
-        if rotation == 1:
-            temp = var_x
-            var_x = var_y
-            var_y = temp
-
-        # Create a list of covered positions for our component's assignment
-        covered = []
-        for r in range(start_y, start_y+var_y):
-            for c in range(start_x, start_x+var_x):
-                covered.append(r*self.n+c)
+    # The domain var starts with: every position and rotation where the component fits on the board
+    def initial_domain(self, var):
+        domain = []
+        for pair in self.domain_values:
+            if self.mask(var, pair) is not None:
+                domain.append(pair)
+        return domain
+
+    # Number of values left in a domain
+    def domain_size(self, domain):
+        return len(domain)
 
-        # See how adjacent components are affected
+    # A hashable key for a domain. Placements are never reordered within a domain, so the ids are in a fixed order
+    def domain_key(self, domain):
+        ids = []
+        for pair in domain:
+            ids.append(pair[0]*2 + pair[1])
+        return tuple(ids)
+
+    # The values left in a domain, in the order they should be tried
+    def domain_list(self, domain):
+        return domain
+
+    # Returns True if val is still in the domain
+    def in_domain(self, val, domain):
+        return val in domain
+
+    # Removes the given values from the domain of var, saving the domain on the trail first if one is given
+    def prune(self, var, values, domains, trail=None):
+        if trail is not None:
+            trail.save(domains, var)
+        for val in values:
+            domains[var].remove(val)
+
+    # Updates the domains based on the constraints. If a trail is given, every domain is saved on it before
+    # being modified so the change can be undone when backtracking
+    def update_domains(self, var, asgnmnt, domains, trail=None):
+        # Union of the cells covered by every placed component
+        occupied = self.occupancy(asgnmnt)
+
+        # Remove the placements of unplaced components that overlap the occupied cells, or that are out of order
+        # with the placement of var
         for adj in domains:
             if adj not in asgnmnt:
+                same = adj in self.same_shape[var]
                 remove = []
-                adj_x = self.x[adj]
-                adj_y = self.y[adj]
                 for pair in domains[adj]:
-                    pos = pair[0]
-                    adj_rot = pair[1]
-                    asx, asy = self.pos_to_xy[pos]
-                    # x and y dimensions are based on the rotation of the component
-                    x_dif = adj_x
-                    y_dif = adj_y
-                    if adj_rot == 1:
-                        x_dif = adj_y
-                        y_dif = adj_x
-                    removed = False
-                    # Remove domains values that overlap
-                    for r in range(asy, asy + y_dif):
-                        for c in range(asx, asx + x_dif):
-                            if r * self.n + c in covered:
-                                remove.append(pair)
-                                removed = True
-                                break
-                        if removed:
-                            break
-                # Removing pairs here - cannot modify what we are looping over inside the loop itself
-                for pair in remove:
-                    domains[adj].remove(pair)
+                    if self.mask(adj, pair) & occupied or same and not self.ordered(var, asgnmnt[var], adj, pair):
+                        remove.append(pair)
+                if len(remove) > 0:
+                    self.prune(adj, remove, domains, trail)
         return domains
 
+    # Bitmask of the cells covered by the components of variables (every component placed in asgnmnt if variables
+    # is None) at their placements in asgnmnt
+    def occupancy(self, asgnmnt, variables=None):
+        if variables is None:
+            variables = asgnmnt.keys()
+        occupied = 0
+        for var in variables:
+            occupied |= self.mask(var, asgnmnt[var])
+        return occupied
+
+    # Prune the domains of the unplaced components of region against every component placed in asgnmnt, where
+    # occupied is the occupancy() of those placements. This is what update_domains() would do for every placed
+    # component, at the cost of one mask test per placement of region (plus the order of same-shaped components)
+    def prune_fixed(self, region, asgnmnt, domains, occupied):
+        for var in region:
+            remove = []
+            for pair in self.domain_list(domains[var]):
+                if self.mask(var, pair) & occupied:
+                    remove.append(pair)
+                    continue
+                for adj in self.same_shape[var]:
+                    if adj in asgnmnt and not self.ordered(adj, asgnmnt[adj], var, pair):
+                        remove.append(pair)
+                        break
+            if len(remove) > 0:
+                self.prune(var, remove, domains)
+
     # Return the reduction in the size of the domain of adj based on the theoretical assignment of var
     def numeric_overlap(self, var, adj, asgnmnt, domains):
-        # Process of finding what squares are covered is repeated here as with update_domains
+        covered = self.mask(var, asgnmnt[var])
+        # The more restricted our domain, the lower the result value
         result = 0
-        covered = []
-        pair = asgnmnt[var]
-        pos = pair[0]
-        rotation = pair[1]
-        start_x, start_y = self.pos_to_xy[pos]
-        # X and Y dimensions based on component's rotation
-        if rotation == 0:
-            var_x = self.x[var]
-            var_y = self.y[var]
-        else:
-            var_x = self.y[var]
-            var_y = self.x[var]
-        # Creating list of covered
-        for r in range(start_y, start_y+var_y):
-            for c in range(start_x, start_x+var_x):
-                covered.append(r * self.n + c)
-
-        adj_x = self.x[adj]
-        adj_y = self.y[adj]
+        same = adj in self.same_shape[var]
         for pair in domains[adj]:
-            pos = pair[0]
-            rotation = pair[1]
-            # starting x and y for position
-            asx, asy = self.pos_to_xy[pos]
-            if rotation == 0:
-                x_dif = adj_x
-                y_dif = adj_y
-            else:
-                x_dif = adj_y
-                y_dif = adj_x
-            # The more restricted our domain, the lower the result value
-            overlap = False
-            for r in range(asy, asy+y_dif):
-                for c in range(asx, asx+x_dif):
-                    if r * self.n + c in covered:
-                        result -= 1
-                        overlap = True
-                        break
-                if overlap:
-                    break
+            if self.mask(adj, pair) & covered or same and not self.ordered(var, asgnmnt[var], adj, pair):
+                result -= 1
         return result
 
     # Return True if there is some valid location for adj based on the assignment of var. Return False otherwise
     def constrained(self, var, val, adj, domains):
-        # Create 'covered', the list of all spaces covered by component var
-        covered = []
-        pos = val[0]
-        rotation = val[1]
-        start_x, start_y = self.pos_to_xy[pos]
-        if rotation == 0:
-            var_x = self.x[var]
-            var_y = self.y[var]
-        else:
-            var_x = self.y[var]
-            var_y = self.x[var]
-        for r in range(start_y, start_y+var_y):
-            for c in range(start_x, start_x+var_x):
-                covered.append(r*self.n+c)
+        return self.support(var, val, adj, domains) is not None
 
-        adj_x = self.x[adj]
-        adj_y = self.y[adj]
-        # for every possible domain value, check if var and adj intersect
+    # Return a location for adj that does not intersect var being assigned val, or None if there is no such location
+    def support(self, var, val, adj, domains):
+        covered = self.mask(var, val)
+        same = adj in self.same_shape[var]
         for pair in domains[adj]:
-            # adj start x (asx) and adj start y (asy)
-            pos = pair[0]
-            rotation = pair[1]
-            asx, asy = self.pos_to_xy[pos]
-            if rotation == 0:
-                x_dif = adj_x
-                y_dif = adj_y
-            else:
-                x_dif = adj_y
-                y_dif = adj_x
-            intersection = False
-            for r in range(asy, asy+y_dif):
-                for c in range(asx, asx+x_dif):
-                    if r*self.n+c in covered:
-                        # if there is some intersection, break to try the next domain value
-                        intersection = True
-                        break
-                if intersection:
-                    break
-            if not intersection:
-                return True
-        # Every possible value for adj results in an intersection, return False
-        return False
+            if not self.mask(adj, pair) & covered and (not same or self.ordered(var, val, adj, pair)):
+                return pair
+        # Every possible value for adj results in an intersection, return None
+        return None
+
+    # Returns (key, order): a hash of the board size and the multiset of component shapes, and the components in
+    # canonical order (by shape, then by index). Components of the same shape are interchangeable, so any problem
+    # with the same key can take a solution encoded with this order. leaf_limit is not needed here
+    def fingerprint(self, leaf_limit=64):
+        order = sorted(range(self.num_variables), key=lambda var: (self.shape(var), var))
+        shapes = []
+        for var in order:
+            shapes.append(self.shape(var))
+        text = repr(("circuit", self.m, self.n, shapes))
+        return hashlib.sha256(text.encode()).hexdigest(), order
+
+    # The solution as a list with the key of the placement (position*2, plus 1 if placed wider than tall) of every
+    # component of order, so it does not depend on how each component's width and height were given
+    def encode_solution(self, asgnmnt, order):
+        encoded = []
+        for var in order:
+            pair = asgnmnt[var]
+            encoded.append(self.keys[var][pair[0]*2 + pair[1]])
+        return encoded
+
+    # Inverse of encode_solution. The placements of every run of same-shaped components are handed out in
+    # increasing order of key, so the solution also satisfies the ordering used with symmetry
+    def decode_solution(self, encoded, order):
+        asgnmnt = {}
+        start = 0
+        while start < len(order):
+            end = start
+            while end < len(order) and self.shape(order[end]) == self.shape(order[start]):
+                end += 1
+            keys = sorted(encoded[start:end])
+            for i in range(start, end):
+                var = order[i]
+                pos = keys[i-start] // 2
+                wide = keys[i-start] % 2
+                # Rotation 0 keeps the given width, so it is wide exactly when the component is given wide
+                if wide == int(self.x[var] > self.y[var]):
+                    asgnmnt[var] = [pos, 0]
+                else:
+                    asgnmnt[var] = [pos, 1]
+            start = end
+        return asgnmnt
 
     # Prints the resulting assignment as a grid to see where the components are located
     def print_grid_format(self, asgnmnt):
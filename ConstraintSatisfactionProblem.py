@@ -1,26 +1,819 @@
 # Written by William Dinauer
 # CS74 Fall 2022
 
+import asyncio
 import random
+import multiprocessing
 import time
-import copy
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 from MapProblem import MapProblem
 from CircuitProblem import CircuitProblem
+from Trail import Trail
+from NogoodStore import NogoodStore
+from VariableIndex import VariableIndex
+from CancelToken import CancelToken
+from SearchResult import SearchResult, SOLVED, UNSATISFIABLE, TIME_LIMIT, NODE_LIMIT, CANCELLED
+
+
+# Domain values may be unhashable (the circuit problem uses [position, rotation] lists), so convert them to a
+# form that can be used as a dictionary key
+def freeze(value):
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+# A copy of an assignment that shares no mutable values with it
+def copy_assignment(asgnmnt):
+    copied = {}
+    for var in asgnmnt:
+        value = asgnmnt[var]
+        if isinstance(value, list):
+            value = list(value)
+        copied[var] = value
+    return copied
+
+
+# The i-th term (starting at 1) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, ...
+def luby(i):
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    if (1 << k) - 1 == i:
+        return 1 << (k-1)
+    return luby(i - (1 << (k-1)) + 1)
+
+
+# Returns the connected components of a graph as lists of variables. Variables with no neighbours are each their
+# own component
+def connected_components(graph):
+    components = []
+    seen = set()
+    for start in graph.keys():
+        if start in seen:
+            continue
+        seen.add(start)
+        component = [start]
+        queue = deque([start])
+        while len(queue) > 0:
+            var = queue.popleft()
+            for adj in graph[var]:
+                if adj not in seen:
+                    seen.add(adj)
+                    component.append(adj)
+                    queue.append(adj)
+        components.append(component)
+    return components
+
+
+# Domains used by repair(), made from the problem's initial_domain() the first time each variable is looked up, so
+# a repair only pays for the variables it reaches. The domains made here are those of variables that keep their
+# value in fixed, so that value is their only value
+class LocalDomains(dict):
+
+    def __init__(self, csp, fixed):
+        super().__init__()
+        self.csp = csp
+        self.fixed = fixed
+
+    def __missing__(self, var):
+        self[var] = self.csp.initial_domain(var)
+        if var in self.fixed:
+            others = []
+            for val in self.csp.domain_list(self[var]):
+                if val != self.fixed[var]:
+                    others.append(val)
+            if len(others) > 0:
+                self.csp.prune(var, others, self)
+        return self[var]
+
+
+# Raised inside the search when a budget runs out or the search is cancelled, to unwind it. status is the
+# SearchResult status the search ends with
+class SearchInterrupted(Exception):
+
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+# Solve one subproblem with a new solver, returning the solution (None unless it was solved), the solver's
+# statistics and the status. Used to solve independent components or whole problems in worker processes, where
+# hooks and cancel tokens cannot be sent, or in this process with the given hooks and cancel token
+def solve_subproblem(item, listeners=None, cancel=None):
+    csp, configuration = item
+    solver = ConstraintSatisfactionProblem(csp, cancel=cancel, **configuration)
+    if listeners is not None:
+        solver.listeners = listeners
+    result = solver.solve()
+    return result.solution, result.statistics, result.status
 
 
 class ConstraintSatisfactionProblem:
-    def __init__(self, csp, heuristic=None, lcv=False, inference=False):
+    # heuristic can be "MRV", "Degree", "dom/wdeg" or None.
+    # inference can be True (or "AC-3") for Arc-3, or "AC-2001" to also keep last-support pointers.
+    # iterative runs the search with an explicit stack instead of recursion, so the number of variables is not
+    # limited by Python's recursion limit.
+    # backjumping enables conflict-directed backjumping (which uses the iterative search). nogoods is the size of
+    # the store of nogoods learned from backjumps; 0 disables nogood recording.
+    # seed seeds the random number generator used to break ties between variables (None seeds it randomly).
+    # restarts can be "luby" or "geometric": the search (which then uses the iterative search) is restarted with a
+    # new variable order whenever it has made restart_base times the next term of the schedule "backtracks" or
+    # "nodes" (restart_on). Geometric schedules grow by restart_factor every run.
+    # decompose solves every connected component of the graph as an independent subproblem (for problems that
+    # provide subproblem()). With processes > 1, components are solved in that many worker processes when there
+    # are at least as many components as processes.
+    # symmetry breaks value symmetry for problems whose values are interchangeable (those that provide
+    # break_symmetry(), like MapProblem): only one value that no assigned variable uses yet is tried for each variable.
+    # profile also measures the time spent selecting variables, ordering values and propagating.
+    # time_limit (in seconds) and node_limit (assignments tried) bound every search, solutions() and
+    # count_solutions() call, and cancel is a CancelToken that stops them from another thread. When one of them
+    # stops a search, backtracking_search() returns None and solve() tells why.
+    # peel first removes the variables that can always be given a value once their neighbours have one (for
+    # problems that provide peel() and extend(), like MapProblem: variables with fewer neighbours than colors),
+    # searches only what is left, and then gives the removed variables values greedily
+    def __init__(self, csp, heuristic=None, lcv=False, inference=False, iterative=False, backjumping=False,
+                 nogoods=0, seed=None, restarts=None, restart_base=100, restart_factor=1.5,
+                 restart_on="backtracks", decompose=False, processes=1, symmetry=False, profile=False,
+                 time_limit=None, node_limit=None, cancel=None, peel=False):
         self.heuristic = heuristic
         self.lcv = lcv
         self.inference = inference
+        self.iterative = iterative
+        self.backjumping = backjumping
+        self.nogoods = nogoods
+        self.seed = seed
+        self.restarts = restarts
+        self.restart_base = restart_base
+        self.restart_factor = restart_factor
+        self.restart_on = restart_on
+        self.decompose = decompose
+        self.processes = processes
+        self.symmetry = symmetry
+        self.profile = profile
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.cancel = cancel
+        self.peel = peel
+        self.random = random.Random(seed)
         self.csp = csp
         self.graph = csp.graph
+        self.trail = Trail()
+        # AC-2001 last supports, mapping (x, value of x, y) to the value of y that last supported it
+        self.supports = {}
+        # Backjumping state: the assigned variables that pruned each domain, as (depth, everything) pairs, and the
+        # depth at which every assigned variable was chosen
+        self.culprits = {}
+        self.depth = {}
+        self.nogood_store = None
+        # How many times the search jumped back over at least one variable, and how many values nogoods pruned
+        self.backjumps = 0
+        self.nogood_hits = 0
+        # Number of assignments tried, how many of them were undone, and how many times the search restarted
+        self.nodes = 0
+        self.backtracks = 0
+        self.restart_count = 0
+        # Variables removed by peeling, and so left out of the search
+        self.peeled = 0
+        # Calls to constrained() (or support() with AC-2001), arcs taken off the Arc-3 queue, and values pruned by
+        # Arc-3 and by update_domains
+        self.checks = 0
+        self.queue_pops = 0
+        self.pruned_ac = 0
+        self.pruned_update = 0
+        # Cache of component counts used by count_solutions(), and how many counts were found in it
+        self.count_cache = None
+        self.cache_size = 0
+        self.cache_hits = 0
+        # Seconds spent in the whole search and (with profile) in each part of it
+        self.search_time = 0.0
+        self.select_time = 0.0
+        self.order_time = 0.0
+        self.propagate_time = 0.0
+        # Event hooks, mapping every event name to the functions called with (event, solver, data) when it happens.
+        # A "progress" event is sent every progress_interval nodes
+        self.listeners = {}
+        self.progress_interval = 1000
+        # The search stops with None once the counter chosen by restart_on reaches the cutoff
+        self.cutoff = None
+        # Random order in which variables are considered, so that ties are broken randomly
+        self.order = []
+        # Priority queue used by select_unassigned_variable, kept up to date by assign() and unassign()
+        self.index = None
+        # dom/wdeg arc weights, mapping x to y to the weight of the arc between them. They are kept across restarts
+        # and searches
+        self.weights = {}
+        # Number of assigned variables using each value, for symmetry breaking
+        self.used = {}
+        # Budget of the current search: the perf_counter() time and node count it has to stop at, and the node
+        # count at which to check the budget next (None if there is nothing to check). The clock and the cancel
+        # token are only checked every check_interval nodes
+        self.deadline = None
+        self.node_end = None
+        self.next_check = None
+        self.check_interval = 256
+        # How the last search ended
+        self.status = None
+        # Values tried first for some variables (the values they had before a repair), and the number of variables
+        # the last repair searched over
+        self.preferred = {}
+        self.repaired = 0
+
+    # The keyword arguments this solver was created with
+    def configuration(self):
+        return {"heuristic": self.heuristic, "lcv": self.lcv, "inference": self.inference,
+                "iterative": self.iterative, "backjumping": self.backjumping, "nogoods": self.nogoods,
+                "seed": self.seed, "restarts": self.restarts, "restart_base": self.restart_base,
+                "restart_factor": self.restart_factor, "restart_on": self.restart_on,
+                "decompose": self.decompose, "processes": self.processes, "symmetry": self.symmetry,
+                "profile": self.profile, "time_limit": self.time_limit, "node_limit": self.node_limit,
+                "peel": self.peel}
 
-    # Initialize the domains and begin the backtracking search
+    # The search counters and timers, as a dictionary
+    def statistics(self):
+        return {"nodes": self.nodes, "backtracks": self.backtracks, "backjumps": self.backjumps,
+                "nogood_hits": self.nogood_hits, "restarts": self.restart_count, "checks": self.checks,
+                "queue_pops": self.queue_pops, "pruned_ac": self.pruned_ac, "pruned_update": self.pruned_update,
+                "cache_hits": self.cache_hits, "peeled": self.peeled, "search_time": self.search_time,
+                "select_time": self.select_time, "order_time": self.order_time,
+                "propagate_time": self.propagate_time}
+
+    # Call hook(event, solver, data) whenever one of the given events happens (every event if events is None):
+    #   "start"      a run starts: data is the run number (runs after the first are restarts)
+    #   "assign"     a value is tried: data is (variable, value, whether the assignment is consistent)
+    #   "unassign"   an assignment is undone: data is the variable
+    #   "backjump"   backjumping skips variables: data is (depth jumped from, depth jumped to)
+    #   "progress"   every progress_interval nodes: data is statistics()
+    #   "finish"     the search ends: data is statistics()
+    # With no hooks attached, each event costs a single check
+    def add_hook(self, hook, events=None):
+        if events is None:
+            events = ["start", "assign", "unassign", "backjump", "progress", "finish"]
+        for event in events:
+            if event not in self.listeners:
+                self.listeners[event] = []
+            self.listeners[event].append(hook)
+
+    def remove_hook(self, hook):
+        for event in list(self.listeners.keys()):
+            if hook in self.listeners[event]:
+                self.listeners[event].remove(hook)
+            if len(self.listeners[event]) == 0:
+                del self.listeners[event]
+
+    # Call the hooks attached to event
+    def emit(self, event, data):
+        for hook in self.listeners.get(event, ()):
+            hook(event, self, data)
+
+    # Initialize the domains and begin the backtracking search. Returns the solution, False if there is none, or
+    # None if the search ran out of budget or was cancelled
     def backtracking_search(self):
+        return self.timed_search(self.run_search)
+
+    # Repair a solution after the problem was changed (for problems that provide initial_domain(), like MapProblem
+    # and CircuitProblem). asgnmnt is a solution of the problem before the change and changed lists the variables
+    # whose constraints changed, as returned by restrict(), add_edge() or add_component(). The changed variables,
+    # and any variable asgnmnt has no value for, are searched again with their old values tried first, while every
+    # other variable keeps its value. If that fails, or takes more than effort backtracks, the variables around
+    # them are freed too, widening the region each time, and the last resort is a full search that still tries the
+    # old values first. A small change is then repaired in time that depends on its neighbourhood, not on the size
+    # of the problem. asgnmnt is repaired in place, so it is never copied: the solution returned is asgnmnt itself,
+    # and asgnmnt is left as it was if there is no solution or the search is stopped. Returns like
+    # backtracking_search()
+    def repair(self, asgnmnt, changed, effort=1000):
+        return self.timed_search(self.run_repair, asgnmnt, changed, effort)
+
+    # Run search(*arguments) with the budget, timing and "finish" event of backtracking_search()
+    def timed_search(self, search, *arguments):
+        start = time.perf_counter()
+        # The problem may have been changed since this solver was made, and add_edge() replaces a CSRGraph
+        self.graph = self.csp.graph
+        try:
+            self.start_budget()
+            result = search(*arguments)
+            if result is False:
+                self.status = UNSATISFIABLE
+            else:
+                self.status = SOLVED
+        except SearchInterrupted as interrupted:
+            result = None
+            self.status = interrupted.status
+        self.search_time += time.perf_counter() - start
+        if self.listeners:
+            self.emit("finish", self.statistics())
+        return result
+
+    # Run backtracking_search() and return a SearchResult, which tells a problem with no solution apart from a
+    # search that was stopped
+    def solve(self):
+        solution = self.backtracking_search()
+        if solution is False:
+            solution = None
+        return SearchResult(self.status, solution, self.statistics())
+
+    # Run solve() in an executor (the event loop's default thread pool if executor is None) and return its
+    # SearchResult without blocking the event loop. Cancelling the awaiting task cancels the search. With a
+    # ProcessPoolExecutor the problem is solved in a worker process, where only time_limit and node_limit can
+    # stop it early
+    async def solve_async(self, executor=None):
+        loop = asyncio.get_running_loop()
+        if isinstance(executor, ProcessPoolExecutor):
+            item = (self.csp, self.configuration())
+            future = loop.run_in_executor(executor, solve_subproblem, item)
+        else:
+            if self.cancel is None:
+                self.cancel = CancelToken()
+            future = loop.run_in_executor(executor, self.solve)
+        try:
+            result = await future
+        except asyncio.CancelledError:
+            if self.cancel is not None:
+                self.cancel.cancel()
+            raise
+        if isinstance(result, tuple):
+            solution, statistics, status = result
+            self.status = status
+            return SearchResult(status, solution, statistics)
+        return result
+
+    # Start the budget of a new search
+    def start_budget(self):
+        self.deadline = None
+        self.node_end = None
+        self.next_check = None
+        if self.time_limit is not None:
+            self.deadline = time.perf_counter() + self.time_limit
+        if self.node_limit is not None:
+            self.node_end = self.nodes + self.node_limit
+        if self.deadline is not None or self.node_end is not None or self.cancel is not None:
+            self.next_check = self.nodes
+            self.check_budget()
+
+    # Raise SearchInterrupted if the budget has run out or the search was cancelled, and schedule the next check
+    def check_budget(self):
+        if self.node_end is not None and self.nodes >= self.node_end:
+            raise SearchInterrupted(NODE_LIMIT)
+        if self.cancel is not None and self.cancel.cancelled():
+            raise SearchInterrupted(CANCELLED)
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchInterrupted(TIME_LIMIT)
+        self.next_check = self.nodes + self.check_interval
+        if self.node_end is not None:
+            self.next_check = min(self.next_check, self.node_end)
+
+    def run_search(self):
+        if self.peel and hasattr(self.csp, "peel") and hasattr(self.csp, "subproblem"):
+            core, peeled = self.csp.peel()
+            if len(peeled) > 0:
+                return self.peeled_search(core, peeled)
+        if self.decompose and hasattr(self.csp, "subproblem"):
+            components = connected_components(self.graph)
+            if len(components) > 1:
+                return self.component_search(components)
+        self.nogood_store = None
+        if self.backjumping and self.nogoods > 0:
+            self.nogood_store = NogoodStore(self.nogoods, freeze)
+        run = 1
+        while True:
+            domains = self.start_run(run)
+            if self.restarts is None and not self.iterative and not self.backjumping:
+                return self.recursive_backtracking({}, domains)
+            result = self.iterative_backtracking({}, domains)
+            if result is not None:
+                return result
+            # Hit the cutoff - restart
+            self.restart_count += 1
+            run += 1
+
+    # The search done by repair(). Every round searches a larger region around the changed variables
+    def run_repair(self, asgnmnt, changed, effort):
+        region = set(changed)
+        # New variables are normally among the changed ones. Only look for others if some are still missing
+        missing = 0
+        for var in region:
+            if var not in asgnmnt:
+                missing += 1
+        if len(asgnmnt) + missing < len(self.graph):
+            for var in self.graph.keys():
+                if var not in asgnmnt:
+                    region.add(var)
+        # The old values of the variables of region, which are tried first. They are taken out of asgnmnt, and the
+        # search extends asgnmnt around the variables that keep their value
+        old = {}
+        for var in region:
+            if var in asgnmnt:
+                old[var] = asgnmnt.pop(var)
+        # Problems that provide prune_fixed() (like CircuitProblem) prune the region against the occupancy of every
+        # fixed variable at once. It is built once, and loses the cells of the variables freed as the region grows
+        occupied = None
+        if hasattr(self.csp, "prune_fixed"):
+            occupied = self.csp.occupancy(asgnmnt)
+        # Number of fixed variables using each value, for symmetry breaking
+        used = {}
+        if self.symmetry:
+            for val in asgnmnt.values():
+                key = freeze(val)
+                used[key] = used.get(key, 0) + 1
+        self.preferred = old
+        solved = False
+        try:
+            # Free the variables within a radius of 0, 1, 2, 4, ... of the changed ones
+            frontier = list(region)
+            radius = 0
+            run = 1
+            while len(region) < len(self.graph):
+                self.repaired = len(region)
+                result = self.search_region(region, asgnmnt, occupied, used, effort, run)
+                if result is not None and result is not False:
+                    solved = True
+                    return result
+                # Take back whatever the search left assigned
+                for var in region:
+                    asgnmnt.pop(var, None)
+                steps = max(1, radius)
+                radius += steps
+                freed = []
+                for step in range(steps):
+                    grown = []
+                    for var in frontier:
+                        for adj in self.graph[var]:
+                            if adj not in region:
+                                region.add(adj)
+                                grown.append(adj)
+                                if adj in asgnmnt:
+                                    old[adj] = asgnmnt.pop(adj)
+                                    freed.append(adj)
+                    frontier = grown
+                if occupied is not None:
+                    occupied &= ~self.csp.occupancy(old, freed)
+                if self.symmetry:
+                    for var in freed:
+                        used[freeze(old[var])] -= 1
+                # The whole of the connected components of the changed variables has been tried
+                if len(frontier) == 0:
+                    break
+                run += 1
+            self.repaired = len(self.graph)
+            self.restore(asgnmnt, region, old)
+            self.preferred = asgnmnt
+            result = self.run_search()
+            if result is None or result is False:
+                return result
+            asgnmnt.update(result)
+            solved = True
+            return asgnmnt
+        finally:
+            self.preferred = {}
+            if not solved:
+                self.restore(asgnmnt, region, old)
+
+    # Give the variables of region their old values back, undoing a repair
+    def restore(self, asgnmnt, region, old):
+        for var in region:
+            asgnmnt.pop(var, None)
+        asgnmnt.update(old)
+
+    # Search the variables of region, none of which are in asgnmnt, with every variable of asgnmnt keeping its
+    # value. occupied is the occupancy of asgnmnt for problems that provide prune_fixed(), and used counts the
+    # values of asgnmnt for symmetry breaking. Returns the solution (asgnmnt, extended), False if the region cannot
+    # be solved that way, or None after effort backtracks
+    def search_region(self, region, asgnmnt, occupied, used, effort, run):
+        self.trail = Trail()
+        self.supports = {}
+        self.culprits = {}
+        self.depth = {}
+        self.nogood_store = None
+        if self.backjumping and self.nogoods > 0:
+            self.nogood_store = NogoodStore(self.nogoods, freeze)
+        self.used = dict(used)
+        self.order = list(region)
+        self.random.shuffle(self.order)
+        self.cutoff = self.progress() + effort
+        # The region's domains are made first, since some problems only update the domains that exist. Then the
+        # fixed variables prune them, for good. Only variables outside the region are made later, so they can be
+        # fixed to their values in asgnmnt
+        domains = LocalDomains(self.csp, asgnmnt)
+        for var in self.order:
+            domains[var] = self.csp.initial_domain(var)
+        if occupied is not None:
+            self.csp.prune_fixed(self.order, asgnmnt, domains, occupied)
+        else:
+            # Only the fixed neighbours of the region can prune it
+            boundary = set()
+            for var in self.order:
+                for adj in self.graph[var]:
+                    if adj in asgnmnt:
+                        boundary.add(adj)
+            for var in boundary:
+                self.csp.update_domains(var, asgnmnt, domains)
+        for var in self.order:
+            if self.csp.domain_size(domains[var]) == 0:
+                return False
+        self.build_index(asgnmnt, domains)
+        if self.listeners:
+            self.emit("start", run)
+        return self.iterative_backtracking(asgnmnt, domains)
+
+    # Solve the core left by peeling as a subproblem (which can still be decomposed), then give the peeled
+    # variables values around its solution
+    def peeled_search(self, core, peeled):
+        self.peeled += len(peeled)
+        asgnmnt = {}
+        if len(core) > 0:
+            configuration = self.configuration()
+            configuration["peel"] = False
+            self.share_budget(configuration)
+            # "finish" is sent once, by this solver
+            listeners = dict(self.listeners)
+            listeners.pop("finish", None)
+            item = (self.csp.subproblem(core), configuration)
+            if not self.merge(asgnmnt, solve_subproblem(item, listeners, self.cancel)):
+                return False
+        return self.csp.extend(asgnmnt, peeled)
+
+    # Solve every component separately and merge the assignments. A failure in one component means there is no
+    # solution, without backtracking over the others. Variables with no neighbours are grouped into one subproblem
+    def component_search(self, components):
+        singletons = []
+        subproblems = []
+        for component in components:
+            if len(component) == 1:
+                singletons.append(component[0])
+            else:
+                subproblems.append(self.csp.subproblem(component))
+        if len(singletons) > 0:
+            subproblems.append(self.csp.subproblem(singletons))
+
+        configuration = self.configuration()
+        configuration["decompose"] = False
+        items = []
+        for subproblem in subproblems:
+            items.append((subproblem, configuration))
+
+        asgnmnt = {}
+        if self.processes > 1 and len(items) >= self.processes:
+            self.share_budget(configuration)
+            # Leaving the with block terminates the pool, so a failing component stops the others
+            with multiprocessing.Pool(self.processes) as pool:
+                for result in pool.imap_unordered(solve_subproblem, items):
+                    if not self.merge(asgnmnt, result):
+                        return False
+        else:
+            # "finish" is sent once, by this solver
+            listeners = dict(self.listeners)
+            listeners.pop("finish", None)
+            for item in items:
+                self.share_budget(configuration)
+                if not self.merge(asgnmnt, solve_subproblem(item, listeners, self.cancel)):
+                    return False
+        return asgnmnt
+
+    # Give the subproblems what is left of the time and node budgets
+    def share_budget(self, configuration):
+        if self.deadline is not None:
+            configuration["time_limit"] = max(0.0, self.deadline - time.perf_counter())
+        if self.node_end is not None:
+            configuration["node_limit"] = self.node_end - self.nodes
+
+    # Add the result of a subproblem to the assignment and counters. Returns False if the subproblem has no
+    # solution, and raises SearchInterrupted if it was stopped
+    def merge(self, asgnmnt, result):
+        solution, statistics, status = result
+        self.nodes += statistics["nodes"]
+        self.backtracks += statistics["backtracks"]
+        self.backjumps += statistics["backjumps"]
+        self.nogood_hits += statistics["nogood_hits"]
+        self.restart_count += statistics["restarts"]
+        self.checks += statistics["checks"]
+        self.queue_pops += statistics["queue_pops"]
+        self.pruned_ac += statistics["pruned_ac"]
+        self.pruned_update += statistics["pruned_update"]
+        self.cache_hits += statistics["cache_hits"]
+        self.peeled += statistics["peeled"]
+        self.select_time += statistics["select_time"]
+        self.order_time += statistics["order_time"]
+        self.propagate_time += statistics["propagate_time"]
+        if status == UNSATISFIABLE:
+            return False
+        if status != SOLVED:
+            raise SearchInterrupted(status)
+        asgnmnt.update(solution)
+        return True
+
+    # Generate every solution, each as a new dictionary, searching depth first with the same variable selection,
+    # value ordering and inference as backtracking_search. The next solution is only searched for when it is asked
+    # for. Backjumping, restarts, decomposition and the symmetry option are not used, so no solution is skipped
+    def solutions(self):
+        self.start_budget()
+        domains = self.start_run(1)
+        asgnmnt = {}
+        if len(self.graph) == 0:
+            yield {}
+            return
+        # Frames of [variable, remaining values, trail mark of its current value]
+        stack = []
+        var = self.select_unassigned_variable(asgnmnt, domains)
+        stack.append([var, iter(self.lcv_order(var, asgnmnt, domains)), None])
+        while len(stack) > 0:
+            frame = stack[-1]
+            var = frame[0]
+            if frame[2] is not None:
+                self.unassign(var, asgnmnt, domains, frame[2])
+                frame[2] = None
+            for value in frame[1]:
+                frame[2] = self.trail.mark()
+                if self.assign(var, value, asgnmnt, domains, False):
+                    if len(asgnmnt) == len(self.graph):
+                        yield copy_assignment(asgnmnt)
+                        self.unassign(var, asgnmnt, domains, frame[2])
+                        frame[2] = None
+                        continue
+                    adj = self.select_unassigned_variable(asgnmnt, domains)
+                    stack.append([adj, iter(self.lcv_order(adj, asgnmnt, domains)), None])
+                    break
+                self.unassign(var, asgnmnt, domains, frame[2])
+                frame[2] = None
+            else:
+                stack.pop()
+
+    # Count the solutions without building them. The unassigned variables are split into connected components,
+    # whose counts multiply, and the count of every component is cached by the domains of its variables, so an
+    # identical residual subproblem is only counted once. At most cache_size counts are kept (the least recently
+    # used ones are dropped). Like solutions(), backjumping, restarts and the symmetry option are not used
+    def count_solutions(self, cache_size=100000):
+        start = time.perf_counter()
+        self.start_budget()
+        domains = self.start_run(1)
+        # Variables are chosen within each component, so the index over every variable is not needed
+        self.index = None
+        self.count_cache = OrderedDict()
+        self.cache_size = cache_size
+        count = self.count_components(list(self.graph.keys()), {}, domains)
+        self.count_cache = None
+        self.search_time += time.perf_counter() - start
+        return count
+
+    # Number of solutions for the unassigned variables among variables, given the current assignment and domains.
+    # Counted with an explicit stack instead of recursion, so the number of variables is not limited by Python's
+    # recursion limit. A product frame ["product", components, next component, total] multiplies the counts of
+    # independent components, and a branch frame ["branch", cache key, variable, remaining values, other variables
+    # of its component, count, trail mark of its current value] adds up the counts of the values of one variable
+    def count_components(self, variables, asgnmnt, domains):
+        stack = [self.product_frame(variables, asgnmnt)]
+        # Count of the frame that was just finished, for the frame below it
+        result = None
+        while True:
+            frame = stack[-1]
+            if frame[0] == "product":
+                if result is not None:
+                    frame[3] *= result
+                    result = None
+                if frame[3] == 0 or frame[2] == len(frame[1]):
+                    stack.pop()
+                    if len(stack) == 0:
+                        return frame[3]
+                    result = frame[3]
+                    continue
+                component = frame[1][frame[2]]
+                frame[2] += 1
+                branch = self.branch_frame(component, domains)
+                if branch[0] == "branch":
+                    stack.append(branch)
+                else:
+                    # Found in the cache
+                    result = branch[1]
+                continue
+
+            # Coming back to a branch frame means the count for its current value is done, so undo that value
+            if result is not None:
+                frame[5] += result
+                result = None
+            if frame[6] is not None:
+                self.unassign(frame[2], asgnmnt, domains, frame[6])
+                frame[6] = None
+            for value in frame[3]:
+                frame[6] = self.trail.mark()
+                if self.assign(frame[2], value, asgnmnt, domains, False):
+                    if len(frame[4]) > 0:
+                        # Descend: the rest of the component is counted by a new product frame
+                        stack.append(self.product_frame(frame[4], asgnmnt))
+                        break
+                    frame[5] += 1
+                self.unassign(frame[2], asgnmnt, domains, frame[6])
+                frame[6] = None
+            else:
+                stack.pop()
+                self.count_cache[frame[1]] = frame[5]
+                if len(self.count_cache) > self.cache_size:
+                    self.count_cache.popitem(last=False)
+                result = frame[5]
+
+    # A product frame over the connected components of the unassigned variables among variables, only crossing
+    # unassigned variables
+    def product_frame(self, variables, asgnmnt):
+        keep = set()
+        for var in variables:
+            if var not in asgnmnt:
+                keep.add(var)
+        components = []
+        seen = set()
+        for start in variables:
+            if start not in keep or start in seen:
+                continue
+            seen.add(start)
+            component = [start]
+            queue = deque([start])
+            while len(queue) > 0:
+                var = queue.popleft()
+                for adj in self.graph[var]:
+                    if adj in keep and adj not in seen:
+                        seen.add(adj)
+                        component.append(adj)
+                        queue.append(adj)
+            components.append(component)
+        return ["product", components, 0, 1]
+
+    # A branch frame counting the solutions of one component of unassigned variables, or ["cached", count] if the
+    # count of the component is already in the cache
+    def branch_frame(self, component, domains):
+        pairs = []
+        for var in component:
+            pairs.append((var, self.domain_key(domains[var])))
+        key = frozenset(pairs)
+        if key in self.count_cache:
+            self.cache_hits += 1
+            self.count_cache.move_to_end(key)
+            return ["cached", self.count_cache[key]]
+
+        # Branch on the variable with the smallest domain, breaking ties by the most neighbours in the component
+        members = set(component)
+        chosen = None
+        best = None
+        for var in component:
+            degree = 0
+            for adj in self.graph[var]:
+                if adj in members:
+                    degree += 1
+            rank = (self.csp.domain_size(domains[var]), -degree)
+            if best is None or rank < best:
+                best = rank
+                chosen = var
+        rest = []
+        for var in component:
+            if var != chosen:
+                rest.append(var)
+        values = list(self.csp.domain_list(domains[chosen]))
+        return ["branch", key, chosen, iter(values), rest, 0, None]
+
+    # A hashable key for a domain, from the problem's domain_key() if it has one
+    def domain_key(self, domain):
+        if hasattr(self.csp, "domain_key"):
+            return self.csp.domain_key(domain)
+        values = []
+        for val in self.csp.domain_list(domain):
+            values.append(freeze(val))
+        return frozenset(values)
+
+    # Reset the search state for a new run (the first one, or a restart) and return fresh domains. Nogoods are
+    # kept across restarts
+    def start_run(self, run):
+        self.trail = Trail()
+        self.supports = {}
+        self.culprits = {}
+        self.depth = {}
+        self.used = {}
+        self.order = list(self.graph.keys())
+        self.random.shuffle(self.order)
+        self.cutoff = None
+        if self.restarts == "luby":
+            self.cutoff = self.progress() + self.restart_base * luby(run)
+        elif self.restarts == "geometric":
+            self.cutoff = self.progress() + int(self.restart_base * self.restart_factor ** (run-1))
         domains = self.csp.initialize_domains()
-        return self.recursive_backtracking({}, domains)
+        self.build_index({}, domains)
+        if self.listeners:
+            self.emit("start", run)
+        return domains
+
+    # Build the variable selection index for the given assignment and domains
+    def build_index(self, asgnmnt, domains):
+        # dom/wdeg weights change on every conflict, so it scans the variables instead
+        if self.heuristic == "dom/wdeg":
+            self.index = None
+            return
+        sizes = {}
+        for var in self.order:
+            sizes[var] = self.csp.domain_size(domains[var])
+        self.index = VariableIndex(self.heuristic, self.order, self.graph, asgnmnt, sizes)
+
+    # The counter that restarts are based on
+    def progress(self):
+        if self.restart_on == "nodes":
+            return self.nodes
+        return self.backtracks
 
     # Follows the pseudocode from the book/slides
     def recursive_backtracking(self, asgnmnt, domains):
@@ -31,69 +824,352 @@ class ConstraintSatisfactionProblem:
         var = self.select_unassigned_variable(asgnmnt, domains)
         # Try every domain value for the chosen variable
         for value in self.order_domain_values(var, asgnmnt, domains):
-            asgnmnt[var] = value
-            # Update the domain given the new assignment
-            new_domain = self.csp.update_domains(var, asgnmnt, copy.deepcopy(domains))
-            # Check for consistency
-            if self.consistent(asgnmnt, new_domain):
-                result = self.recursive_backtracking(asgnmnt, new_domain)
+            if self.assign(var, value, asgnmnt, domains):
+                result = self.recursive_backtracking(asgnmnt, domains)
                 if result is not False:
                     return result
             # Failed for this assignment - backtrack
-            asgnmnt.pop(var)
+            self.unassign(var, asgnmnt, domains)
         return False
 
-    # Check if the assignment is consistent based on the domains (and potentially Arc-3)
-    def consistent(self, asgnmnt, domains):
-        # Arc-3 algorithm
+    # Same search as recursive_backtracking, with an explicit stack of [variable, remaining values, trail mark,
+    # conflict depths, conflict floor] frames in place of the recursion. The conflict set of a frame is only used
+    # for backjumping: it holds the depths of the variables responsible for its values failing, plus every depth
+    # up to and including the floor. Returns None if the restart cutoff is reached
+    def iterative_backtracking(self, asgnmnt, domains):
+        if len(asgnmnt) == len(self.graph):
+            return asgnmnt
+        stack = []
+        self.push_frame(stack, asgnmnt, domains)
+        while len(stack) > 0:
+            if self.cutoff is not None and self.progress() >= self.cutoff:
+                return None
+            frame = stack[-1]
+            var = frame[0]
+            # Coming back to a frame means its current value failed, so undo it before trying the next one
+            if frame[2] is not None:
+                self.retract(frame, asgnmnt, domains)
+            for value in frame[1]:
+                # A recorded nogood rules this value out: the variables in it join the conflict set
+                if self.nogood_store is not None:
+                    nogood = self.nogood_store.find(var, value, asgnmnt)
+                    if nogood is not None:
+                        self.nogood_hits += 1
+                        for other, _ in nogood:
+                            if other != var:
+                                frame[3].add(self.depth[other])
+                        continue
+                frame[2] = self.trail.mark()
+                if self.assign(var, value, asgnmnt, domains, False):
+                    if self.backjumping:
+                        self.record_culprits(len(stack)-1, frame[2])
+                    if len(asgnmnt) == len(self.graph):
+                        return asgnmnt
+                    # Descend: the new frame is handled on the next pass of the while loop
+                    self.push_frame(stack, asgnmnt, domains)
+                    break
+                if self.backjumping:
+                    self.explain_failure(frame, len(stack)-1, domains)
+                self.unassign(var, asgnmnt, domains, frame[2])
+                frame[2] = None
+            else:
+                # Every value failed - backtrack to the previous frame, or further back when backjumping
+                stack.pop()
+                if self.backjumping and not self.backjump(stack, frame, asgnmnt, domains):
+                    return False
+        return False
+
+    # Select the next variable and push a new frame for it onto the stack
+    def push_frame(self, stack, asgnmnt, domains):
+        var = self.select_unassigned_variable(asgnmnt, domains)
+        self.depth[var] = len(stack)
+        values = self.order_domain_values(var, asgnmnt, domains)
+        floor = -1
+        # Values left out by symmetry breaking depend on the values used by every earlier assignment
+        if self.symmetry and len(values) < self.csp.domain_size(domains[var]):
+            floor = len(stack) - 1
+        stack.append([var, iter(values), None, set(), floor])
+
+    # Undo the current (successful) assignment of a frame
+    def retract(self, frame, asgnmnt, domains):
+        if self.backjumping:
+            for var in self.trail.changed(frame[2]):
+                self.culprits[var].pop()
+        self.unassign(frame[0], asgnmnt, domains, frame[2])
+        frame[2] = None
+
+    # Remember that the assignment at depth pruned every domain changed since mark. With inference, the pruning
+    # can depend on any earlier assignment, so it is blamed on everything up to depth
+    def record_culprits(self, depth, mark):
+        everything = bool(self.inference)
+        for var in self.trail.changed(mark):
+            if var not in self.culprits:
+                self.culprits[var] = []
+            self.culprits[var].append((depth, everything))
+
+    # Add the reason the value just assigned in frame failed to its conflict set. Without inference, a failure
+    # that wiped out a domain is caused by the variables that pruned that domain. Anything else is blamed on every
+    # earlier assignment
+    def explain_failure(self, frame, depth, domains):
+        if not self.inference:
+            for var in self.trail.changed(frame[2]):
+                if self.csp.domain_size(domains[var]) == 0:
+                    self.add_culprits(frame, var)
+                    return
+        frame[4] = max(frame[4], depth-1)
+
+    # Add the variables that pruned the domain of var to the conflict set of frame
+    def add_culprits(self, frame, var):
+        for depth, everything in self.culprits.get(var, ()):
+            if everything:
+                frame[4] = max(frame[4], depth)
+            else:
+                frame[3].add(depth)
+
+    # Called with the exhausted frame already popped off the stack. Jump back to the deepest variable in its
+    # conflict set, undoing every assignment above it and passing the rest of the conflict set on to it. Returns
+    # False if the conflict set is empty, in which case there is no solution
+    def backjump(self, stack, frame, asgnmnt, domains):
+        # The values of the variable were also ruled out by whatever pruned its domain
+        self.add_culprits(frame, frame[0])
+        conflicts = frame[3]
+        floor = frame[4]
+        if len(conflicts) == 0 and floor < 0:
+            return False
+        target = floor
+        if len(conflicts) > 0:
+            target = max(target, max(conflicts))
+        # The assignment of the conflict set is a nogood. Only record it when it is not the whole path
+        if self.nogood_store is not None and floor < 0:
+            variables = []
+            for depth in conflicts:
+                variables.append(stack[depth][0])
+            self.nogood_store.add(variables, asgnmnt)
+        if target < len(stack) - 1:
+            self.backjumps += 1
+            if self.listeners:
+                self.emit("backjump", (len(stack), target))
+        while len(stack) > target + 1:
+            self.retract(stack.pop(), asgnmnt, domains)
+        conflicts.discard(target)
+        stack[target][3].update(conflicts)
+        stack[target][4] = max(stack[target][4], min(floor, target-1))
+        return True
+
+    # Assign value to var, update the domains given the new assignment (recording every change on the trail) and
+    # return whether the result is consistent. mark is False if the caller has already started a trail level
+    def assign(self, var, value, asgnmnt, domains, mark=True):
+        if self.next_check is not None and self.nodes >= self.next_check:
+            self.check_budget()
+        self.nodes += 1
+        asgnmnt[var] = value
+        if self.symmetry:
+            key = freeze(value)
+            self.used[key] = self.used.get(key, 0) + 1
+        if mark:
+            self.trail.mark()
+        if self.profile:
+            result = self.profiled_propagate(var, asgnmnt, domains)
+        else:
+            self.csp.update_domains(var, asgnmnt, domains, self.trail)
+            self.count_pruned(domains)
+            result = self.consistent(asgnmnt, domains, var)
+        if self.listeners:
+            self.emit("assign", (var, value, result))
+            if self.nodes % self.progress_interval == 0:
+                self.emit("progress", self.statistics())
+        if not result:
+            return False
+        # Only successful assignments are recorded in the index, since failed ones are undone straight away
+        if self.index is not None:
+            self.index.assign(var)
+            for changed in self.trail.changed():
+                self.index.resize(changed, self.csp.domain_size(domains[changed]))
+        return True
+
+    # Count the values update_domains pruned in the current trail level. The trail holds every domain it changed
+    # as it was before, so this only costs a size comparison per changed domain
+    def count_pruned(self, domains):
+        for changed, domain in self.trail.saved_domains():
+            self.pruned_update += self.csp.domain_size(domain) - self.csp.domain_size(domains[changed])
+
+    # The propagation done by assign(), timed
+    def profiled_propagate(self, var, asgnmnt, domains):
+        start = time.perf_counter()
+        self.csp.update_domains(var, asgnmnt, domains, self.trail)
+        self.count_pruned(domains)
+        result = self.consistent(asgnmnt, domains, var)
+        self.propagate_time += time.perf_counter() - start
+        return result
+
+    # Undo an assignment made by assign(), restoring the domains back to the given trail mark
+    def unassign(self, var, asgnmnt, domains, mark=None):
+        self.backtracks += 1
+        if self.listeners:
+            self.emit("unassign", var)
+        if self.index is not None and var in self.index.assigned:
+            changed = self.trail.changed(mark)
+            self.trail.undo(domains, mark)
+            for adj in changed:
+                self.index.resize(adj, self.csp.domain_size(domains[adj]))
+            self.index.unassign(var)
+        else:
+            self.trail.undo(domains, mark)
+        value = asgnmnt.pop(var)
+        if self.symmetry:
+            self.used[freeze(value)] -= 1
+
+    # Check if the assignment is consistent based on the domains (and potentially Arc-3). var is the variable that
+    # was just assigned; without it, Arc-3 starts from every arc in the graph
+    def consistent(self, asgnmnt, domains, var=None):
+        # Arc-3 algorithm (Maintaining Arc Consistency)
         if self.inference:
-            # Initialize the queue
-            queue = []
-            for start in self.graph.keys():
-                for end in self.graph[start]:
-                    queue.append([start, end])
+            # Initialize the queue. Every arc is queued at most once
+            queue = deque()
+            queued = set()
+            # The first assignment starts from domains that have never been made arc consistent, so use every arc
+            if var is None or len(asgnmnt) == 1:
+                for start in domains:
+                    if self.csp.domain_size(domains[start]) == 0:
+                        self.conflict(var, start)
+                        return False
+                for start in self.graph.keys():
+                    for end in self.graph[start]:
+                        queue.append((start, end))
+                        queued.add((start, end))
+            else:
+                # Only arcs into the assigned variable and into variables whose domains changed can have lost support
+                changed = self.trail.changed()
+                for end in changed:
+                    if self.csp.domain_size(domains[end]) == 0:
+                        self.conflict(var, end)
+                        return False
+                changed.append(var)
+                for end in changed:
+                    for start in self.graph[end]:
+                        if (start, end) not in queued:
+                            queue.append((start, end))
+                            queued.add((start, end))
 
             # Perform Arc-3 until the queue is empty
             while len(queue) > 0:
-                x, y = queue.pop(0)
-                if self.remove_inconsistent_values(x, y, domains):
+                arc = queue.popleft()
+                queued.discard(arc)
+                self.queue_pops += 1
+                x, y = arc
+                if self.inference == "AC-2001":
+                    removed = self.remove_unsupported_values(x, y, domains)
+                else:
+                    removed = self.remove_inconsistent_values(x, y, domains)
+                if removed:
+                    # If a variable has an empty domain, the assignment is inconsistent
+                    if self.csp.domain_size(domains[x]) == 0:
+                        self.conflict(x, y)
+                        return False
                     for adj in self.graph[x]:
-                        queue.append([adj, x])
-
-            # If any variables have an empty domain, return False
-            for var in domains:
-                if len(domains[var]) == 0:
-                    return False
+                        if adj != y and (adj, x) not in queued:
+                            queue.append((adj, x))
+                            queued.add((adj, x))
             return True
 
         # Arc-3 not enforced:
-        # Check if any variables have an empty domain
-        for var in domains:
-            if len(domains[var]) == 0:
+        # Check if any variables have an empty domain. After an assignment, only the domains it changed can have
+        # been wiped out
+        if var is None:
+            candidates = domains
+        else:
+            candidates = self.trail.changed()
+        for other in candidates:
+            if self.csp.domain_size(domains[other]) == 0:
+                self.conflict(var, other)
                 return False
         # For every assigned variable, check that adjacent variables still have a valid value
-        for var in asgnmnt.keys():
-            val = asgnmnt[var]
-            for adj in self.graph[var]:
-                if not self.csp.constrained(var, val, adj, domains):
+        for other in asgnmnt.keys():
+            val = asgnmnt[other]
+            for adj in self.graph[other]:
+                self.checks += 1
+                if not self.csp.constrained(other, val, adj, domains):
+                    self.conflict(other, adj)
                     return False
             return True
 
+    # Record that the constraint between x and y wiped out a domain. For dom/wdeg, this increases the weight of
+    # the arc between them
+    def conflict(self, x, y):
+        if self.heuristic == "dom/wdeg" and x is not None and x != y:
+            if x not in self.weights:
+                self.weights[x] = {}
+            if y not in self.weights:
+                self.weights[y] = {}
+            weight = self.weights[x].get(y, 1) + 1
+            self.weights[x][y] = weight
+            self.weights[y][x] = weight
+
+    # Weighted degree of var for dom/wdeg: the sum of the weights of the arcs to unassigned neighbours, where
+    # every arc starts with a weight of 1
+    def weighted_degree(self, var, asgnmnt):
+        weights = self.weights.get(var, {})
+        wdeg = 0
+        for adj in self.graph[var]:
+            if adj not in asgnmnt:
+                wdeg += weights.get(adj, 1)
+        return wdeg
+
     # Helper function for Arc-3, based on pseudocode from book and slides
     def remove_inconsistent_values(self, x, y, domains):
         removed = False
         marked = []
-        for val in domains[x]:
+        for val in self.csp.domain_list(domains[x]):
+            self.checks += 1
             satisfied = self.csp.constrained(x, val, y, domains)
             if not satisfied:
                 marked.append(val)
                 removed = True
-        for val in marked:
-            domains[x].remove(val)
+        if removed:
+            self.pruned_ac += len(marked)
+            self.csp.prune(x, marked, domains, self.trail)
         return removed
 
-    # Order the domain values based on LCV
+    # AC-2001 version of remove_inconsistent_values. The last value of y found to support each value of x is
+    # remembered, and as long as it is still in the domain of y, the constrained() check is skipped
+    def remove_unsupported_values(self, x, y, domains):
+        marked = []
+        for val in self.csp.domain_list(domains[x]):
+            key = (x, freeze(val), y)
+            last = self.supports.get(key)
+            if last is not None and self.csp.in_domain(last, domains[y]):
+                continue
+            self.checks += 1
+            support = self.csp.support(x, val, y, domains)
+            if support is None:
+                marked.append(val)
+            else:
+                self.supports[key] = support
+        if len(marked) == 0:
+            return False
+        self.pruned_ac += len(marked)
+        self.csp.prune(x, marked, domains, self.trail)
+        return True
+
+    # Order the domain values based on LCV, leaving out values that are symmetric to one already in the list
     def order_domain_values(self, var, asgnmnt, domains):
+        if self.profile:
+            start = time.perf_counter()
+        values = self.lcv_order(var, asgnmnt, domains)
+        if var in self.preferred and self.preferred[var] in values:
+            preferred = self.preferred[var]
+            ordered = [preferred]
+            for val in values:
+                if val != preferred:
+                    ordered.append(val)
+            values = ordered
+        if self.symmetry and hasattr(self.csp, "break_symmetry"):
+            values = self.csp.break_symmetry(var, values, self.used)
+        if self.profile:
+            self.order_time += time.perf_counter() - start
+        return values
+
+    def lcv_order(self, var, asgnmnt, domains):
         # Least Constraining Value Heuristic
         if self.lcv:
             # Initialize dict mapping values to level of constraint
@@ -103,20 +1179,20 @@ class ConstraintSatisfactionProblem:
             current_constraint = 0
             for adj in self.graph[var]:
                 if adj not in asgnmnt:
-                    current_constraint += len(domains[adj])
+                    current_constraint += self.csp.domain_size(domains[adj])
 
             # Initialize mapping in case domain values are not a single integer
             num_to_domain_val = {}
             num = 0
             # Try every legal value and store the difference in the constraint
-            for val in domains[var]:
+            for val in self.csp.domain_list(domains[var]):
                 new_constraint = 0
                 asgnmnt[var] = val
                 num_to_domain_val[num] = val
                 for adj in self.graph[var]:
                     if adj not in asgnmnt:
                         # Add the length of the domain for adjacent variables
-                        new_constraint += len(domains[adj])
+                        new_constraint += self.csp.domain_size(domains[adj])
                         # Subtract any overlap
                         new_constraint += self.csp.numeric_overlap(var, adj, asgnmnt, domains)
                 asgnmnt.pop(var)
@@ -130,12 +1206,20 @@ class ConstraintSatisfactionProblem:
             for pair in sort:
                 ret.append(num_to_domain_val[pair[0]])
             return ret
-        return domains[var]
+        return self.csp.domain_list(domains[var])
 
     def select_unassigned_variable(self, asgnmnt, domains):
-        variables = list(self.graph.keys())
-        random.seed(time.time())
-        random.shuffle(variables)
+        if not self.profile:
+            return self.choose_variable(asgnmnt, domains)
+        start = time.perf_counter()
+        var = self.choose_variable(asgnmnt, domains)
+        self.select_time += time.perf_counter() - start
+        return var
+
+    def choose_variable(self, asgnmnt, domains):
+        if self.index is not None:
+            return self.index.select(asgnmnt)
+        variables = self.order
 
         # Minimum Remaining Value Heuristic
         if self.heuristic == "MRV":
@@ -145,7 +1229,7 @@ class ConstraintSatisfactionProblem:
             for var in variables:
                 if var not in asgnmnt.keys():
                     # Get the number of legal values for the variable
-                    num_values = len(domains[var])
+                    num_values = self.csp.domain_size(domains[var])
                     # If we have a minimum, select it as the variable to be chosen
                     if num_values < min_val:
                         min_val = num_values
@@ -161,7 +1245,7 @@ class ConstraintSatisfactionProblem:
             for var in variables:
                 if var not in asgnmnt.keys():
                     # Get the number of legal values for the variable
-                    num_values = len(domains[var])
+                    num_values = self.csp.domain_size(domains[var])
                     # If we have a minimum, select it as the variable to be chosen
                     if num_values < min_val:
                         min_val = num_values
@@ -182,6 +1266,23 @@ class ConstraintSatisfactionProblem:
                     chosen_var = var
             return chosen_var
 
+        # Domain size over weighted degree, where the weights grow as arcs cause domain wipe-outs
+        elif self.heuristic == "dom/wdeg":
+            min_ratio = None
+            chosen_var = None
+            for var in variables:
+                if var not in asgnmnt:
+                    wdeg = self.weighted_degree(var, asgnmnt)
+                    # A variable with no unassigned neighbours can always be left for later
+                    if wdeg == 0:
+                        ratio = float('inf')
+                    else:
+                        ratio = self.csp.domain_size(domains[var]) / wdeg
+                    if chosen_var is None or ratio < min_ratio:
+                        min_ratio = ratio
+                        chosen_var = var
+            return chosen_var
+
         # No heuristic - simply random choice
         else:
             for var in variables:
@@ -0,0 +1,157 @@
+# Written by William Dinauer
+# CS74 Fall 2022
+
+from ConstraintSatisfactionProblem import ConstraintSatisfactionProblem
+from Trail import Trail
+
+
+# Returns a cycle cutset of the graph: variables whose removal leaves a forest. Variables with at most one
+# neighbour left are on no cycle, so they are peeled off; when none is left, every remaining variable is on a
+# cycle and the one with the most neighbours goes into the cutset. Returns None as soon as the cutset would have
+# more than limit variables
+def cycle_cutset(graph, limit=None):
+    degree = {}
+    queue = []
+    for var in graph.keys():
+        degree[var] = len(graph[var])
+        if degree[var] <= 1:
+            queue.append(var)
+    removed = set()
+    cutset = []
+    while True:
+        while len(queue) > 0:
+            var = queue.pop()
+            if var in removed:
+                continue
+            removed.add(var)
+            for adj in graph[var]:
+                if adj not in removed:
+                    degree[adj] -= 1
+                    if degree[adj] == 1:
+                        queue.append(adj)
+        if len(removed) == len(graph):
+            return cutset
+        if limit is not None and len(cutset) == limit:
+            return None
+        chosen = None
+        for var in graph.keys():
+            if var not in removed and (chosen is None or degree[var] > degree[chosen]):
+                chosen = var
+        cutset.append(chosen)
+        queue.append(chosen)
+        # The chosen variable is removed like a peeled one, whatever its degree
+        degree[chosen] = 0
+
+
+# Structural solver for constraint graphs that are trees or close to trees. Every tree of the forest left once a
+# cycle cutset is removed is solved without backtracking: directional arc consistency from the leaves up to the root
+# leaves every value of a parent with a supporting value in each child, so the tree is then assigned from the root
+# down, each variable taking a value that supports its parent's. For a forest the cutset is empty and this takes
+# O(n d^2). Otherwise every consistent assignment of the cutset is tried (with forward checking) and the forest is
+# solved given it, which is exponential in the cutset size only. If the cutset has more than max_cutset variables,
+# the problem is solved by backtracking_search() with a ConstraintSatisfactionProblem made with options instead
+class CutsetSolver:
+
+    def __init__(self, csp, max_cutset=8, **options):
+        self.csp = csp
+        self.graph = csp.graph
+        self.max_cutset = max_cutset
+        self.options = options
+        # The cutset used by the last search (None if it was too large), how many cutset assignments reached the
+        # forest, and the solver used instead when the cutset was too large
+        self.cutset = None
+        self.cutset_assignments = 0
+        self.solver = None
+
+    # Returns a solution, False if there is none, or None if the fallback search ran out of budget
+    def search(self):
+        self.cutset = cycle_cutset(self.graph, self.max_cutset)
+        if self.cutset is None:
+            self.solver = ConstraintSatisfactionProblem(self.csp, **self.options)
+            return self.solver.backtracking_search()
+        self.build_forest()
+        self.trail = Trail()
+        self.cutset_assignments = 0
+        return self.condition(0, {}, self.csp.initialize_domains())
+
+    # Split the variables outside the cutset into trees, each as a list of variables in breadth first order from
+    # its root, and record the parent of every variable but the roots
+    def build_forest(self):
+        cut = set(self.cutset)
+        self.trees = []
+        self.parent = {}
+        seen = set()
+        for root in self.graph.keys():
+            if root in cut or root in seen:
+                continue
+            seen.add(root)
+            tree = [root]
+            i = 0
+            while i < len(tree):
+                var = tree[i]
+                for adj in self.graph[var]:
+                    if adj not in cut and adj not in seen:
+                        seen.add(adj)
+                        self.parent[adj] = var
+                        tree.append(adj)
+                i += 1
+            self.trees.append(tree)
+
+    # Assign the cutset variables from position i on, pruning the domains of their neighbours as they are assigned,
+    # and solve the forest once the whole cutset is assigned
+    def condition(self, i, asgnmnt, domains):
+        if i == len(self.cutset):
+            self.cutset_assignments += 1
+            return self.solve_forest(asgnmnt, domains)
+        var = self.cutset[i]
+        for val in list(self.csp.domain_list(domains[var])):
+            mark = self.trail.mark()
+            asgnmnt[var] = val
+            self.csp.update_domains(var, asgnmnt, domains, self.trail)
+            if not self.wiped_out(var, asgnmnt, domains):
+                result = self.condition(i + 1, asgnmnt, domains)
+                if result is not False:
+                    return result
+            del asgnmnt[var]
+            self.trail.undo(domains, mark)
+        return False
+
+    # Returns True if assigning var left an unassigned neighbour without values
+    def wiped_out(self, var, asgnmnt, domains):
+        for adj in self.graph[var]:
+            if adj not in asgnmnt and self.csp.domain_size(domains[adj]) == 0:
+                return True
+        return False
+
+    # Solve every tree given the domains left by the cutset assignment. Returns the complete assignment, or False
+    # (with the domains restored) if some tree has no solution
+    def solve_forest(self, asgnmnt, domains):
+        mark = self.trail.mark()
+        solution = dict(asgnmnt)
+        for tree in self.trees:
+            # Directional arc consistency, children before their parents
+            for i in range(len(tree) - 1, 0, -1):
+                child = tree[i]
+                parent = self.parent[child]
+                unsupported = []
+                for val in self.csp.domain_list(domains[parent]):
+                    if self.csp.support(parent, val, child, domains) is None:
+                        unsupported.append(val)
+                if len(unsupported) > 0:
+                    self.csp.prune(parent, unsupported, domains, self.trail)
+                    if self.csp.domain_size(domains[parent]) == 0:
+                        self.trail.undo(domains, mark)
+                        return False
+            if self.csp.domain_size(domains[tree[0]]) == 0:
+                self.trail.undo(domains, mark)
+                return False
+            # Every value left has support below it, so the tree is assigned without backtracking
+            for val in self.csp.domain_list(domains[tree[0]]):
+                solution[tree[0]] = val
+                break
+            for i in range(1, len(tree)):
+                child = tree[i]
+                parent = self.parent[child]
+                solution[child] = self.csp.support(parent, solution[parent], child, domains)
+        self.trail.undo(domains, mark)
+        return solution
@@ -0,0 +1,214 @@
+# Written by William Dinauer
+# CS74 Fall 2022
+
+from array import array
+from collections.abc import Mapping
+
+# NumPy is optional: with it, sorting the edges into rows is vectorized
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Undirected graph in compressed sparse row form: the neighbours of vertex v are
+# neighbours[offsets[v]:offsets[v+1]], sorted and without duplicates or self loops. Vertices are the dense ids
+# 0..n-1, and labels[v] is the label v was read with. It behaves like the dict of sets the problems are usually
+# given (graph[v], graph.keys(), len(graph)), so MapProblem and the solver can use it directly, at a fraction of
+# the memory. graph[v] is a read-only memoryview into neighbours, so looking up a row copies nothing
+class CSRGraph(Mapping):
+
+    def __init__(self, offsets, neighbours, labels):
+        self.offsets = offsets
+        self.neighbours = neighbours
+        self.labels = labels
+        # View of neighbours that rows are sliced from without copying
+        self.view = memoryview(neighbours).toreadonly()
+        # Label to id, built the first time a label is looked up
+        self.ids = None
+
+    # Memoryviews cannot be pickled, so the view is made again when the graph is sent to another process
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["view"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.view = memoryview(self.neighbours).toreadonly()
+
+    def __getitem__(self, v):
+        if not isinstance(v, int) or v < 0 or v >= len(self.offsets) - 1:
+            raise KeyError(v)
+        return self.view[self.offsets[v]:self.offsets[v+1]]
+
+    def __iter__(self):
+        return iter(range(len(self.offsets) - 1))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __contains__(self, v):
+        return isinstance(v, int) and 0 <= v < len(self.offsets) - 1
+
+    def degree(self, v):
+        return self.offsets[v+1] - self.offsets[v]
+
+    # Number of undirected edges
+    def edge_count(self):
+        return len(self.neighbours) // 2
+
+    # The id of a label
+    def id(self, label):
+        if self.ids is None:
+            self.ids = {}
+            for v in range(len(self.labels)):
+                self.ids[self.labels[v]] = v
+        return self.ids[label]
+
+    # The graph as a dict of sets
+    def to_dict(self):
+        graph = {}
+        for v in range(len(self)):
+            graph[v] = set(self[v])
+        return graph
+
+    # An assignment over the ids as one over the labels
+    def relabel(self, asgnmnt):
+        labelled = {}
+        for v, value in asgnmnt.items():
+            labelled[self.labels[v]] = value
+        return labelled
+
+
+# Build a CSRGraph with n vertices from the edges sources[i] - targets[i], where vertices are numbered from first.
+# Edges are stored in both directions, then every row is sorted and cleaned of duplicates and self loops
+def build_csr(n, sources, targets, labels, first=0):
+    if np is not None:
+        return build_csr_numpy(n, sources, targets, labels, first)
+    degrees = array("q", bytes(8 * (n + 1)))
+    for v in sources:
+        degrees[v - first] += 1
+    for v in targets:
+        degrees[v - first] += 1
+    offsets = array("q", bytes(8 * (n + 1)))
+    for v in range(n):
+        offsets[v+1] = offsets[v] + degrees[v]
+    # Counting sort of the edges into their rows, reusing degrees as the next free slot of every row
+    neighbours = array("i", bytes(4 * offsets[n]))
+    for v in range(n):
+        degrees[v] = offsets[v]
+    for i in range(len(sources)):
+        u = sources[i] - first
+        v = targets[i] - first
+        neighbours[degrees[u]] = v
+        degrees[u] += 1
+        neighbours[degrees[v]] = u
+        degrees[v] += 1
+    # Sort and compact every row
+    compact = array("i")
+    start = 0
+    for v in range(n):
+        row = set(neighbours[start:offsets[v+1]])
+        row.discard(v)
+        start = offsets[v+1]
+        compact.extend(sorted(row))
+        offsets[v+1] = len(compact)
+    return CSRGraph(offsets, compact, labels)
+
+
+# build_csr with NumPy: every directed edge u -> v becomes the key u * n + v, so sorting the keys groups the edges
+# by row with sorted neighbours, and duplicates end up next to each other
+def build_csr_numpy(n, sources, targets, labels, first):
+    u = np.frombuffer(sources, dtype=np.dtype("i%d" % sources.itemsize)).astype(np.int64) - first
+    v = np.frombuffer(targets, dtype=np.dtype("i%d" % targets.itemsize)).astype(np.int64) - first
+    keep = u != v
+    u = u[keep]
+    v = v[keep]
+    keys = np.concatenate([u * n + v, v * n + u])
+    keys.sort()
+    if len(keys) > 0:
+        distinct = np.empty(len(keys), dtype=bool)
+        distinct[0] = True
+        np.not_equal(keys[1:], keys[:-1], out=distinct[1:])
+        keys = keys[distinct]
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys // n, minlength=n), out=offsets[1:])
+    neighbours = (keys % n).astype(np.dtype("i%d" % array("i").itemsize))
+    return CSRGraph(array("q", offsets.tobytes()), array("i", neighbours.tobytes()), labels)
+
+
+# Read an adjacency list file, one vertex per line followed by its neighbours, like USA_Map.txt ("AL,MS,TN,GA,FL").
+# Labels can be any string without the separator (whitespace if separator is None), and are given ids in the order
+# they first appear. The file is read once, line by line; an edge listed from either end (or both) is added once
+def load_adjacency(path, separator=","):
+    ids = {}
+    labels = []
+    sources = array("i")
+    targets = array("i")
+    with open(path, "r") as f:
+        for line in f:
+            fields = line.split(separator)
+            if separator is not None:
+                stripped = []
+                for field in fields:
+                    field = field.strip()
+                    if len(field) > 0:
+                        stripped.append(field)
+                fields = stripped
+            if len(fields) == 0:
+                continue
+            ends = []
+            for label in fields:
+                v = ids.get(label)
+                if v is None:
+                    v = len(labels)
+                    ids[label] = v
+                    labels.append(label)
+                ends.append(v)
+            for adj in ends[1:]:
+                sources.append(ends[0])
+                targets.append(adj)
+    return build_csr(len(labels), sources, targets, labels)
+
+
+# Read a graph in the DIMACS edge format used by the graph coloring benchmarks: "c" comment lines, a
+# "p edge <vertices> <edges>" line and one "e <u> <v>" line per edge, with vertices numbered from 1. Vertex v of
+# the file gets id v - 1 and label v
+def load_dimacs(path):
+    n = None
+    sources = array("i")
+    targets = array("i")
+    with open(path, "r") as f:
+        while True:
+            # Read a block of lines at a time and split all the edge lines at once
+            lines = f.readlines(1 << 22)
+            if len(lines) == 0:
+                break
+            edges = []
+            for line in lines:
+                if line.startswith("e"):
+                    edges.append(line)
+                elif line.startswith("p"):
+                    n = int(line.split()[2])
+            if len(edges) == 0:
+                continue
+            if n is None:
+                raise ValueError("edge before the problem line in " + path)
+            fields = " ".join(edges).split()
+            if len(fields) != 3 * len(edges):
+                raise ValueError("edge lines must be \"e <u> <v>\" in " + path)
+            sources.extend(map(int, fields[1::3]))
+            targets.extend(map(int, fields[2::3]))
+    if n is None:
+        raise ValueError("no problem line in " + path)
+    if len(sources) > 0 and (min(min(sources), min(targets)) < 1 or max(max(sources), max(targets)) > n):
+        raise ValueError("vertex out of range in " + path)
+    return build_csr(n, sources, targets, range(1, n + 1), 1)
+
+
+# Load a graph, choosing the format from the extension: DIMACS for .col files, adjacency lists otherwise
+def load_graph(path, separator=","):
+    if path.endswith(".col"):
+        return load_dimacs(path)
+    return load_adjacency(path, separator)
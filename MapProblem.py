@@ -1,19 +1,97 @@
 # Written by William Dinauer
 # CS74 Fall 2022
 
+import hashlib
+
+from Partition import canonical_order
+
+
 class MapProblem:
 
     def __init__(self, graph, domain_values):
         self.graph = graph
         self.domain_values = domain_values
+        # The values allowed for variables restricted by restrict(). Every other variable can take any value
+        self.allowed = {}
+
+    # Returns the problem restricted to the given variables, keeping only the edges between them
+    def subproblem(self, variables):
+        keep = set(variables)
+        graph = {}
+        for var in variables:
+            graph[var] = set()
+            for adj in self.graph[var]:
+                if adj in keep:
+                    graph[var].add(adj)
+        problem = type(self)(graph, self.domain_values)
+        for var in variables:
+            if var in self.allowed:
+                problem.restrict(var, self.allowed[var])
+        return problem
 
     def initialize_domains(self):
         # Every domain starts with the same domain values
         domains = {}
         for var in self.graph.keys():
             domains[var] = set(self.domain_values)
+        for var in self.allowed:
+            domains[var] = self.initial_domain(var)
         return domains
 
+    # The domain var starts with
+    def initial_domain(self, var):
+        return set(self.allowed.get(var, self.domain_values))
+
+    # The values var can take before any other variable is assigned
+    def values_of(self, var):
+        return self.allowed.get(var, self.domain_values)
+
+    # Allow only the given values for var. Returns the variables whose constraints changed, for repair()
+    def restrict(self, var, values):
+        allowed = []
+        for val in self.domain_values:
+            if val in values:
+                allowed.append(val)
+        self.allowed[var] = allowed
+        return [var]
+
+    # Add an edge between u and v, adding them to the graph if needed. Returns the variables whose constraints
+    # changed, for repair(). A graph that cannot be changed in place (a CSRGraph from GraphLoader) is first turned
+    # into a dict of sets, which takes more memory
+    def add_edge(self, u, v):
+        if not isinstance(self.graph, dict):
+            self.graph = self.graph.to_dict()
+        if u not in self.graph:
+            self.graph[u] = set()
+        if v not in self.graph:
+            self.graph[v] = set()
+        self.graph[u].add(v)
+        self.graph[v].add(u)
+        return [u, v]
+
+    # Number of values left in a domain
+    def domain_size(self, domain):
+        return len(domain)
+
+    # A hashable key for a domain, equal for domains with the same values
+    def domain_key(self, domain):
+        return frozenset(domain)
+
+    # The values left in a domain, in the order they should be tried
+    def domain_list(self, domain):
+        return domain
+
+    # Returns True if val is still in the domain
+    def in_domain(self, val, domain):
+        return val in domain
+
+    # Removes the given values from the domain of var, saving the domain on the trail first if one is given
+    def prune(self, var, values, domains, trail=None):
+        if trail is not None:
+            trail.save(domains, var)
+        for val in values:
+            domains[var].remove(val)
+
     # Returns True or False depending on if we are constrained or not
     def constrained(self, var, val, adj, domains):
         # As long as there is a valid value for the adjacent variables, we are good to go
@@ -22,17 +100,139 @@ class MapProblem:
                 return True
         return False
 
-    # Updates the domains such that illegal values are removed from the domain
-    def update_domains(self, var, asgnmnt, domains):
+    # Returns a value of adj that is compatible with var being assigned val, or None if there is no such value
+    def support(self, var, val, adj, domains):
+        for adj_val in domains[adj]:
+            if adj_val != val:
+                return adj_val
+        return None
+
+    # Returns (key, order): a hash of the graph structure and domain values, and the variables in canonical order.
+    # Graphs that are equal up to relabelling their vertices get the same key (unless the canonical labelling gives
+    # up after leaf_limit candidate orders), and a solution encoded with one order can be decoded with the other
+    def fingerprint(self, leaf_limit=64):
+        variables = list(self.graph.keys())
+        index = {}
+        for var in variables:
+            index[var] = len(index)
+        neighbours = []
+        for var in variables:
+            around = []
+            for adj in self.graph[var]:
+                around.append(index[adj])
+            neighbours.append(around)
+        order, edges = canonical_order(neighbours, leaf_limit)
+        values = []
+        for val in self.value_order():
+            values.append(repr(val))
+        canonical = []
+        for i in order:
+            canonical.append(variables[i])
+        # Restricted variables are keyed by their canonical position. The labelling ignores the restrictions, so
+        # relabellings of a restricted problem may miss the cache, but equal keys are always the same problem
+        restricted = []
+        for i in range(len(canonical)):
+            if canonical[i] in self.allowed:
+                allowed = []
+                for val in self.allowed[canonical[i]]:
+                    allowed.append(repr(val))
+                restricted.append((i, sorted(allowed)))
+        text = repr(("map", values, len(variables), edges, restricted))
+        return hashlib.sha256(text.encode()).hexdigest(), canonical
+
+    # The domain values in a fixed order that does not depend on the order they were given in
+    def value_order(self):
+        return sorted(self.domain_values, key=repr)
+
+    # The solution as a list with the position in value_order() of the value of every variable of order
+    def encode_solution(self, asgnmnt, order):
+        position = {}
+        values = self.value_order()
+        for i in range(len(values)):
+            position[repr(values[i])] = i
+        encoded = []
+        for var in order:
+            encoded.append(position[repr(asgnmnt[var])])
+        return encoded
+
+    # Inverse of encode_solution, for this problem's variables in order
+    def decode_solution(self, encoded, order):
+        values = self.value_order()
+        asgnmnt = {}
+        for i in range(len(order)):
+            asgnmnt[order[i]] = values[encoded[i]]
+        return asgnmnt
+
+    # Peel off, again and again, every variable with fewer neighbours left than there are colors: whatever colors
+    # its remaining neighbours get, one is left for it. Returns (core, peeled): the variables left (the k-core of
+    # the graph, for k colors) and the peeled variables in the order they were removed
+    def peel(self):
+        degree = {}
+        queue = []
+        for var in self.graph.keys():
+            degree[var] = len(self.graph[var])
+            if degree[var] < len(self.values_of(var)):
+                queue.append(var)
+        removed = set()
+        peeled = []
+        while len(queue) > 0:
+            var = queue.pop()
+            if var in removed:
+                continue
+            removed.add(var)
+            peeled.append(var)
+            for adj in self.graph[var]:
+                if adj not in removed:
+                    degree[adj] -= 1
+                    if degree[adj] == len(self.values_of(adj)) - 1:
+                        queue.append(adj)
+        core = []
+        for var in self.graph.keys():
+            if var not in removed:
+                core.append(var)
+        return core, peeled
+
+    # Color the variables peeled by peel(), given a solution of the core: in the reverse of the order they were
+    # peeled in, every variable takes the first color none of its neighbours has
+    def extend(self, asgnmnt, peeled):
+        for i in range(len(peeled) - 1, -1, -1):
+            var = peeled[i]
+            taken = set()
+            for adj in self.graph[var]:
+                if adj in asgnmnt:
+                    taken.add(asgnmnt[adj])
+            for val in self.values_of(var):
+                if val not in taken:
+                    asgnmnt[var] = val
+                    break
+        return asgnmnt
+
+    # Colors are interchangeable: swapping two colors in a solution gives another solution. So of the colors that
+    # no assigned variable uses yet (used counts the variables assigned each color), only the first one in values
+    # needs to be tried. Colors are not interchangeable once some variables are restricted to some of them
+    def break_symmetry(self, var, values, used):
+        if len(self.allowed) > 0:
+            return values
+        kept = []
+        unused = False
+        for val in values:
+            if used.get(val, 0) > 0:
+                kept.append(val)
+            elif not unused:
+                kept.append(val)
+                unused = True
+        return kept
+
+    # Updates the domains such that illegal values are removed from the domain. If a trail is given, every
+    # domain is saved on it before being modified so the change can be undone when backtracking
+    def update_domains(self, var, asgnmnt, domains, trail=None):
         # If an adjacent variable has a color that matches the assignment of our variable, remove
         # that color from their domain
+        color = asgnmnt[var]
         for adj in self.graph[var]:
-            remove = []
-            for color in domains[adj]:
-                if color == asgnmnt[var]:
-                    remove.append(color)
-                    break
-            for color in remove:
+            if color in domains[adj]:
+                if trail is not None:
+                    trail.save(domains, adj)
                 domains[adj].remove(color)
         return domains
 
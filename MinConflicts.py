@@ -0,0 +1,151 @@
+# Written by William Dinauer
+# CS74 Fall 2022
+
+import random
+import time
+
+
+# Min-conflicts local search for map coloring problems (MapProblem or BitMapProblem). Every vertex always has a
+# color, and each step moves a random conflicted vertex to the color shared with the fewest neighbours (which may be
+# its current color, leaving it in place). For every vertex, the number of neighbours with each color is kept up to
+# date as vertices are recolored, along with the set of conflicted vertices, so a step costs O(degree + colors) no
+# matter how large the graph is.
+# Recoloring a vertex back to the color it just left is tabu for tabu steps, unless it would give the fewest
+# conflicts seen so far. With probability walk, a step picks a random color instead of the best one
+class MinConflicts:
+
+    def __init__(self, csp, max_steps=100000, time_limit=None, tabu=10, walk=0.05, greedy=True, seed=None):
+        # Every vertex is free to take every color
+        if len(csp.allowed) > 0:
+            raise ValueError("min-conflicts does not support restricted variables")
+        self.csp = csp
+        self.graph = csp.graph
+        self.colors = len(csp.domain_values)
+        self.max_steps = max_steps
+        self.time_limit = time_limit
+        self.tabu = tabu
+        self.walk = walk
+        self.greedy = greedy
+        self.random = random.Random(seed)
+        # Number of steps taken by the last search
+        self.steps = 0
+
+    # Returns (assignment, conflicts): a valid assignment and 0, or the best assignment found and its number of
+    # conflicting edges if the step or time budget runs out first
+    def search(self):
+        start = time.time()
+        # color[v] is the index of the color of v in domain_values, and counts[v][c] the number of neighbours of
+        # v with color c
+        self.color = {}
+        self.counts = {}
+        for var in self.graph.keys():
+            self.counts[var] = [0] * self.colors
+        if self.greedy:
+            self.greedy_coloring()
+        else:
+            for var in self.graph.keys():
+                self.color[var] = self.random.randrange(self.colors)
+        for var in self.graph.keys():
+            for adj in self.graph[var]:
+                self.counts[adj][self.color[var]] += 1
+
+        # Conflicted vertices, kept as a list with the position of every vertex so one can be removed in O(1)
+        self.conflicted = []
+        self.position = {}
+        total = 0
+        for var in self.graph.keys():
+            self.update(var)
+            total += self.counts[var][self.color[var]]
+        self.total = total // 2
+
+        # Instead of copying the coloring whenever it improves, keep the moves made since the best coloring so
+        # they can be undone at the end
+        best_total = self.total
+        since_best = []
+        tabu_until = {}
+        self.steps = 0
+        # With a single color, no move can remove a conflict
+        while self.total > 0 and self.steps < self.max_steps and self.colors > 1:
+            if self.time_limit is not None and self.steps % 1024 == 0 and time.time() - start > self.time_limit:
+                break
+            self.steps += 1
+            var = self.conflicted[self.random.randrange(len(self.conflicted))]
+            old = self.color[var]
+            counts = self.counts[var]
+            if self.random.random() < self.walk:
+                new = self.random.randrange(self.colors - 1)
+                if new >= old:
+                    new += 1
+            else:
+                new = old
+                fewest = counts[old]
+                ties = 1
+                for color in range(self.colors):
+                    if color == old:
+                        continue
+                    # Ties are broken at random, so a vertex can move sideways to another color with as many
+                    # conflicts. Tabu moves are allowed only if they would beat the best total found so far
+                    if tabu_until.get((var, color), 0) > self.steps and \
+                            self.total - counts[old] + counts[color] >= best_total:
+                        continue
+                    if counts[color] < fewest:
+                        new = color
+                        fewest = counts[color]
+                        ties = 1
+                    elif counts[color] == fewest:
+                        ties += 1
+                        if self.random.randrange(ties) == 0:
+                            new = color
+                if new == old:
+                    continue
+            self.recolor(var, new)
+            tabu_until[(var, old)] = self.steps + self.tabu
+            if self.total < best_total:
+                best_total = self.total
+                since_best = []
+            else:
+                since_best.append((var, old))
+
+        for var, old in reversed(since_best):
+            self.color[var] = old
+        asgnmnt = {}
+        for var in self.color:
+            asgnmnt[var] = self.csp.domain_values[self.color[var]]
+        return asgnmnt, best_total
+
+    # Color the vertices in order of decreasing degree, each with the color used by the fewest neighbours
+    # colored so far
+    def greedy_coloring(self):
+        order = list(self.graph.keys())
+        order.sort(key=lambda var: len(self.graph[var]), reverse=True)
+        for var in order:
+            used = [0] * self.colors
+            for adj in self.graph[var]:
+                if adj in self.color:
+                    used[self.color[adj]] += 1
+            self.color[var] = used.index(min(used))
+
+    # Move var to color new, updating the neighbour counts, the conflicted set and the number of conflicts
+    def recolor(self, var, new):
+        old = self.color[var]
+        self.total += self.counts[var][new] - self.counts[var][old]
+        self.color[var] = new
+        for adj in self.graph[var]:
+            self.counts[adj][old] -= 1
+            self.counts[adj][new] += 1
+            self.update(adj)
+        self.update(var)
+
+    # Add var to or remove it from the conflicted vertices according to its current counts
+    def update(self, var):
+        conflicted = self.counts[var][self.color[var]] > 0
+        if conflicted and var not in self.position:
+            self.position[var] = len(self.conflicted)
+            self.conflicted.append(var)
+        elif not conflicted and var in self.position:
+            # Move the last vertex into the removed vertex's slot
+            i = self.position.pop(var)
+            last = self.conflicted.pop()
+            if last != var:
+                self.conflicted[i] = last
+                self.position[last] = i
@@ -0,0 +1,59 @@
+# Written by William Dinauer
+# CS74 Fall 2022
+
+from collections import OrderedDict
+
+
+# Bounded store of nogoods: partial assignments known to have no solution. Each nogood is a frozenset of
+# (variable, key) pairs, where key(value) makes the value hashable. When the store is full, the least recently
+# used nogood is evicted
+class NogoodStore:
+
+    def __init__(self, size, key):
+        self.size = size
+        self.key = key
+        self.nogoods = OrderedDict()
+        # Maps every (variable, value) pair to the nogoods that contain it
+        self.index = {}
+
+    def __len__(self):
+        return len(self.nogoods)
+
+    # Record the assignment of the given variables as a new nogood
+    def add(self, variables, asgnmnt):
+        pairs = []
+        for var in variables:
+            pairs.append((var, self.key(asgnmnt[var])))
+        nogood = frozenset(pairs)
+        if len(nogood) == 0:
+            return
+        if nogood in self.nogoods:
+            self.nogoods.move_to_end(nogood)
+            return
+        self.nogoods[nogood] = None
+        for pair in nogood:
+            if pair not in self.index:
+                self.index[pair] = set()
+            self.index[pair].add(nogood)
+        if len(self.nogoods) > self.size:
+            oldest, _ = self.nogoods.popitem(last=False)
+            for pair in oldest:
+                self.index[pair].discard(oldest)
+                if len(self.index[pair]) == 0:
+                    del self.index[pair]
+
+    # Return a nogood that contains var being assigned value and whose other pairs all hold in the assignment.
+    # Returns None if there is no such nogood
+    def find(self, var, value, asgnmnt):
+        for nogood in self.index.get((var, self.key(value)), ()):
+            matched = True
+            for other, other_value in nogood:
+                if other == var:
+                    continue
+                if other not in asgnmnt or self.key(asgnmnt[other]) != other_value:
+                    matched = False
+                    break
+            if matched:
+                self.nogoods.move_to_end(nogood)
+                return nogood
+        return None
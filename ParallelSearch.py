@@ -0,0 +1,212 @@
+# Written by William Dinauer
+# CS74 Fall 2022
+
+import multiprocessing
+import queue
+
+from ConstraintSatisfactionProblem import ConstraintSatisfactionProblem
+
+# How many nodes a worker expands between checks for a solution found elsewhere or for idle workers
+CHECK_INTERVAL = 64
+
+
+# Start a run on solver and assign every (variable, value) pair of prefix in order. Returns the assignment and
+# domains, or None if the prefix is inconsistent
+def replay(solver, prefix):
+    domains = solver.start_run(1)
+    asgnmnt = {}
+    for var, value in prefix:
+        if not solver.assign(var, value, asgnmnt, domains):
+            return None
+    return asgnmnt, domains
+
+
+# Worker process: take subproblems (prefixes of assignments) off the task queue and search them, donating part of
+# the current subtree back to the queue whenever another worker is idle
+def work(csp, options, tasks, results, found, outstanding, idle, donations):
+    solver = ConstraintSatisfactionProblem(csp, **options)
+    waiting = False
+    while not found.is_set():
+        try:
+            prefix = tasks.get(timeout=0.05)
+        except queue.Empty:
+            if not waiting:
+                waiting = True
+                with idle.get_lock():
+                    idle.value += 1
+            if outstanding.value == 0:
+                return
+            continue
+        if waiting:
+            waiting = False
+            with idle.get_lock():
+                idle.value -= 1
+        result = search_subtree(solver, prefix, tasks, found, outstanding, idle, donations)
+        if result is not False and result is not None:
+            results.put(dict(result))
+            found.set()
+        with outstanding.get_lock():
+            outstanding.value -= 1
+
+
+# Depth-first search below prefix with a stack of [variable, values, next value position, trail mark] frames.
+# Returns a solution, False if the subtree has none, or None if another worker found a solution first
+def search_subtree(solver, prefix, tasks, found, outstanding, idle, donations):
+    state = replay(solver, prefix)
+    if state is None:
+        return False
+    asgnmnt, domains = state
+    if len(asgnmnt) == len(solver.graph):
+        return asgnmnt
+    stack = []
+    push(solver, stack, asgnmnt, domains)
+    nodes = 0
+    while len(stack) > 0:
+        nodes += 1
+        if nodes % CHECK_INTERVAL == 0:
+            if found.is_set():
+                return None
+            if idle.value > 0 and tasks.empty():
+                donate(solver, prefix, stack, asgnmnt, tasks, outstanding, donations)
+        frame = stack[-1]
+        var, values = frame[0], frame[1]
+        if frame[3] is not None:
+            solver.unassign(var, asgnmnt, domains, frame[3])
+            frame[3] = None
+        while frame[2] < len(values):
+            value = values[frame[2]]
+            frame[2] += 1
+            frame[3] = solver.trail.mark()
+            if solver.assign(var, value, asgnmnt, domains, False):
+                if len(asgnmnt) == len(solver.graph):
+                    return asgnmnt
+                push(solver, stack, asgnmnt, domains)
+                break
+            solver.unassign(var, asgnmnt, domains, frame[3])
+            frame[3] = None
+        else:
+            stack.pop()
+    return False
+
+
+def push(solver, stack, asgnmnt, domains):
+    var = solver.select_unassigned_variable(asgnmnt, domains)
+    stack.append([var, list(solver.order_domain_values(var, asgnmnt, domains)), 0, None])
+
+
+# Give away half of the untried values of the shallowest frame that has any. Each becomes a new task: the path to
+# that frame followed by the variable being assigned the value
+def donate(solver, prefix, stack, asgnmnt, tasks, outstanding, donations):
+    path = list(prefix)
+    for frame in stack:
+        var, values, position = frame[0], frame[1], frame[2]
+        remaining = len(values) - position
+        if remaining > 0:
+            count = (remaining + 1) // 2
+            given = values[len(values)-count:]
+            del values[len(values)-count:]
+            with outstanding.get_lock():
+                outstanding.value += count
+            with donations.get_lock():
+                donations.value += count
+            for value in given:
+                tasks.put(path + [(var, value)])
+            return
+        if var not in asgnmnt:
+            return
+        path.append((var, asgnmnt[var]))
+
+
+# Splits the search tree of one problem across worker processes. The first few variables picked by
+# select_unassigned_variable are fixed to every consistent combination of values, giving independent subproblems
+# that are put on a shared queue. Workers that run out of subproblems become idle, and busy workers then donate
+# untried values near the root of their own subtree. The first solution found ends the run; if every subproblem
+# is exhausted, the problem has no solution
+class ParallelSearch:
+
+    # options are ConstraintSatisfactionProblem keyword arguments used by every worker (backjumping and restarts
+    # are not used here). split is the number of subproblems per process to create before starting the workers
+    def __init__(self, csp, options=None, processes=None, split=4):
+        self.csp = csp
+        if options is None:
+            options = {"heuristic": "Degree", "inference": True}
+        self.options = options
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        self.processes = processes
+        self.split = split
+        # Number of subproblems created at the start and donated by busy workers
+        self.subproblems = 0
+        self.donations = 0
+
+    # Expand the search tree breadth first until there are enough prefixes. Returns the list of prefixes, or a
+    # solution if one is found while expanding
+    def initial_prefixes(self):
+        solver = ConstraintSatisfactionProblem(self.csp, **self.options)
+        prefixes = [[]]
+        while 0 < len(prefixes) < self.split * self.processes:
+            expanded = []
+            for prefix in prefixes:
+                state = replay(solver, prefix)
+                if state is None:
+                    continue
+                asgnmnt, domains = state
+                if len(asgnmnt) == len(solver.graph):
+                    return dict(asgnmnt)
+                var = solver.select_unassigned_variable(asgnmnt, domains)
+                for value in list(solver.order_domain_values(var, asgnmnt, domains)):
+                    mark = solver.trail.mark()
+                    if solver.assign(var, value, asgnmnt, domains, False):
+                        expanded.append(prefix + [(var, value)])
+                    solver.unassign(var, asgnmnt, domains, mark)
+            prefixes = expanded
+        return prefixes
+
+    # Returns a solution, or False if there is none. Raises RuntimeError if a worker dies (killed, out of memory),
+    # since the subproblem it was searching is lost with it
+    def search(self):
+        prefixes = self.initial_prefixes()
+        if isinstance(prefixes, dict):
+            return prefixes
+        if len(prefixes) == 0:
+            return False
+        self.subproblems = len(prefixes)
+
+        tasks = multiprocessing.Queue()
+        results = multiprocessing.Queue()
+        found = multiprocessing.Event()
+        outstanding = multiprocessing.Value('i', len(prefixes))
+        idle = multiprocessing.Value('i', 0)
+        donations = multiprocessing.Value('i', 0)
+        for prefix in prefixes:
+            tasks.put(prefix)
+
+        workers = []
+        for i in range(self.processes):
+            worker = multiprocessing.Process(target=work, args=(self.csp, self.options, tasks, results, found,
+                                                                  outstanding, idle, donations))
+            worker.start()
+            workers.append(worker)
+        try:
+            while True:
+                try:
+                    return results.get(timeout=0.05)
+                except queue.Empty:
+                    pass
+                # A worker sets found before marking its task finished, so a solution is never missed here
+                if outstanding.value == 0:
+                    if found.is_set():
+                        return results.get()
+                    return False
+                # A dead worker never finishes its task, so outstanding would never get to 0
+                for worker in workers:
+                    if worker.exitcode is not None and worker.exitcode != 0:
+                        raise RuntimeError("worker process %d exited with code %d" % (worker.pid, worker.exitcode))
+        finally:
+            found.set()
+            # Tasks left on the queue are abandoned, so do not wait for them to be flushed when exiting
+            tasks.cancel_join_thread()
+            self.donations = donations.value
+            for worker in workers:
+                worker.terminate()
+                worker.join()
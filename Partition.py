@@ -0,0 +1,285 @@
+# Written by William Dinauer
+# CS74 Fall 2022
+
+from collections import deque
+
+
+# Ordered partition of the vertices of a graph, used to label graphs canonically. The vertices are kept in a list
+# where every cell is a contiguous run, and a cell is named by the position it starts at, so cells are numbered the
+# same way whatever the labels of the vertices are. Every change is logged on a trail, so splitting cells while
+# branching can be undone back to a mark instead of copying the partition.
+# neighbours[v] lists the neighbours of vertex v
+class Partition:
+
+    def __init__(self, neighbours):
+        n = len(neighbours)
+        self.neighbours = neighbours
+        # The vertices, cell by cell
+        self.order = list(range(n))
+        # Position of every vertex in order
+        self.position = list(range(n))
+        # Position the cell of every vertex starts at
+        self.start = [0] * n
+        # For the position a cell starts at, the position after its last vertex
+        self.end = [n] * n
+        self.cells = min(n, 1)
+        # (list, index, previous value) for every change made since the first mark. Changes made before it are
+        # never undone, so they are not logged
+        self.trail = []
+        self.logging = False
+
+    def write(self, values, i, value):
+        if values[i] != value:
+            if self.logging:
+                self.trail.append((values, i, values[i]))
+            values[i] = value
+
+    def mark(self):
+        self.logging = True
+        return len(self.trail), self.cells
+
+    # Undo every change made since mark was taken
+    def undo(self, mark):
+        length, cells = mark
+        while len(self.trail) > length:
+            values, i, value = self.trail.pop()
+            values[i] = value
+        self.cells = cells
+
+    # Returns True once every cell is a single vertex
+    def discrete(self):
+        return self.cells == len(self.order)
+
+    # The start of the first cell with more than one vertex, or None if the partition is discrete
+    def target_cell(self):
+        i = 0
+        while i < len(self.order):
+            if self.end[i] - i > 1:
+                return i
+            i = self.end[i]
+        return None
+
+    # The vertices of the cell starting at s
+    def cell(self, s):
+        return self.order[s:self.end[s]]
+
+    # Move v to the back of its cell and make it a cell of its own, so the rest of the cell keeps its start.
+    # Returns the start of the new cell
+    def individualize(self, v):
+        s = self.start[v]
+        e = self.end[s]
+        w = self.order[e - 1]
+        p = self.position[v]
+        self.write(self.order, p, w)
+        self.write(self.position, w, p)
+        self.write(self.order, e - 1, v)
+        self.write(self.position, v, e - 1)
+        self.write(self.end, s, e - 1)
+        self.write(self.end, e - 1, e)
+        self.write(self.start, v, e - 1)
+        self.cells += 1
+        return e - 1
+
+    # Make every vertex of the cell starting at s a cell of its own, in their current order. Returns their starts
+    def separate(self, s):
+        e = self.end[s]
+        for i in range(s, e):
+            self.write(self.start, self.order[i], i)
+            self.write(self.end, i, i + 1)
+        self.cells += e - s - 1
+        return list(range(s, e))
+
+    # Split cells until the partition is equitable: every vertex of a cell has the same number of neighbours in
+    # each other cell. queue holds the starts of the cells to split the others by. A cell is split by the number
+    # of neighbours its vertices have in the splitting cell, and the parts are ordered by that number, so the result
+    # does not depend on the labels. Only cells with neighbours in the splitting cell are looked at
+    def refine(self, queue):
+        queue = deque(queue)
+        queued = set(queue)
+        while len(queue) > 0:
+            s = queue.popleft()
+            queued.discard(s)
+            counts = {}
+            for i in range(s, self.end[s]):
+                for u in self.neighbours[self.order[i]]:
+                    counts[u] = counts.get(u, 0) + 1
+            touched = {}
+            for u in counts:
+                c = self.start[u]
+                if c not in touched:
+                    touched[c] = []
+                touched[c].append(u)
+            for c in sorted(touched.keys()):
+                members = touched[c]
+                e = self.end[c]
+                if e - c == 1:
+                    continue
+                members.sort(key=lambda u: counts[u])
+                if len(members) == e - c and counts[members[0]] == counts[members[-1]]:
+                    continue
+                # Move the members to the back of the cell, sorted by count, and the other vertices to the front
+                back = e - len(members)
+                inside = set(members)
+                slots = []
+                for u in members:
+                    if self.position[u] < back:
+                        slots.append(self.position[u])
+                outside = []
+                for i in range(back, e):
+                    if self.order[i] not in inside:
+                        outside.append(self.order[i])
+                for i in range(len(slots)):
+                    self.write(self.order, slots[i], outside[i])
+                    self.write(self.position, outside[i], slots[i])
+                for i in range(len(members)):
+                    self.write(self.order, back + i, members[i])
+                    self.write(self.position, members[i], back + i)
+                # The vertices without neighbours in s keep the start of the cell
+                parts = []
+                if back > c:
+                    parts.append((c, back))
+                i = back
+                while i < e:
+                    j = i
+                    while j < e and counts[self.order[j]] == counts[self.order[i]]:
+                        j += 1
+                    parts.append((i, j))
+                    i = j
+                for p, q in parts:
+                    self.write(self.end, p, q)
+                    if p != c:
+                        for i in range(p, q):
+                            self.write(self.start, self.order[i], p)
+                self.cells += len(parts) - 1
+                # If c was already waiting, all of its parts have to split the others. Otherwise the largest part
+                # can be left out: its counts follow from those of c and of the other parts
+                largest = None
+                if c not in queued:
+                    largest = parts[0]
+                    for part in parts:
+                        if part[1] - part[0] > largest[1] - largest[0]:
+                            largest = part
+                for part in parts:
+                    if part != largest and part[0] not in queued:
+                        queue.append(part[0])
+                        queued.add(part[0])
+
+
+# Returns True if every vertex of cell has the same neighbours as the others (ignoring the vertices themselves), so
+# any order of them gives the same graph
+def twins(neighbours, cell):
+    members = set(cell)
+    first = None
+    for v in cell:
+        around = set(neighbours[v]) - members
+        if first is None:
+            first = around
+        elif around != first:
+            return False
+    # The vertices of the cell must also be all adjacent or all non-adjacent to each other
+    inside = None
+    for v in cell:
+        count = len(members.intersection(neighbours[v]))
+        if inside is None:
+            inside = count
+        elif count != inside:
+            return False
+    return inside == 0 or inside == len(cell) - 1
+
+
+# The sorted edges of the graph once every vertex is numbered by its position in order, with the edge between
+# positions i < j written as i * n + j
+def certificate(neighbours, order):
+    n = len(order)
+    position = [0] * n
+    for i in range(n):
+        position[order[i]] = i
+    edges = []
+    for v in range(n):
+        p = position[v]
+        for u in neighbours[v]:
+            if p < position[u]:
+                edges.append(p * n + position[u])
+    edges.sort()
+    return edges
+
+
+# Canonical labelling of a connected graph by individualization and refinement. Every discrete partition reached
+# by refining, then repeatedly picking a vertex of the first cell with more than one vertex and refining again, gives
+# an order of the vertices; the one with the smallest certificate is the same for every relabelling of the graph.
+# Cells of twins are ordered without branching. If more than leaf_limit orders would have to be compared, the best
+# one found so far is used: it is still a valid order, but relabellings of the graph may then get different ones
+def canonical_component(neighbours, leaf_limit):
+    partition = Partition(neighbours)
+    partition.refine([0])
+    best = None
+    best_order = None
+    leaves = 0
+    # Frames of [mark before branching, vertices of the cell being branched on, next vertex of the cell to try]
+    stack = []
+    while True:
+        while not partition.discrete():
+            s = partition.target_cell()
+            cell = partition.cell(s)
+            if twins(neighbours, cell):
+                partition.refine(partition.separate(s))
+                continue
+            stack.append([partition.mark(), cell, 1])
+            partition.refine([partition.individualize(cell[0])])
+        leaves += 1
+        found = certificate(neighbours, partition.order)
+        if best is None or found < best:
+            best = found
+            best_order = list(partition.order)
+        while len(stack) > 0 and stack[-1][2] == len(stack[-1][1]):
+            stack.pop()
+        if len(stack) == 0 or leaves >= leaf_limit:
+            return best_order, best
+        frame = stack[-1]
+        partition.undo(frame[0])
+        v = frame[1][frame[2]]
+        frame[2] += 1
+        partition.refine([partition.individualize(v)])
+
+
+# Canonical labelling of a graph, one connected component at a time so the symmetries between components (such as
+# many isolated edges) never have to be searched. Components are put in the order of their sizes and certificates.
+# Returns (order, certificate), where order lists vertices by their canonical position and the certificate is the
+# same for every relabelling of the graph (unless a component needed more than leaf_limit leaves)
+def canonical_order(neighbours, leaf_limit=64):
+    seen = [False] * len(neighbours)
+    labelled = []
+    for root in range(len(neighbours)):
+        if seen[root]:
+            continue
+        seen[root] = True
+        component = [root]
+        i = 0
+        while i < len(component):
+            for u in neighbours[component[i]]:
+                if not seen[u]:
+                    seen[u] = True
+                    component.append(u)
+            i += 1
+        # Number the vertices of the component from 0
+        index = {}
+        for v in component:
+            index[v] = len(index)
+        local = []
+        for v in component:
+            around = []
+            for u in neighbours[v]:
+                around.append(index[u])
+            local.append(around)
+        order, edges = canonical_component(local, leaf_limit)
+        vertices = []
+        for v in order:
+            vertices.append(component[v])
+        labelled.append(((len(component), edges), vertices))
+    labelled.sort(key=lambda pair: pair[0])
+    order = []
+    certificate = []
+    for key, vertices in labelled:
+        order.extend(vertices)
+        certificate.append(key)
+    return order, certificate
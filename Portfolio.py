@@ -0,0 +1,69 @@
+# Written by William Dinauer
+# CS74 Fall 2022
+
+import multiprocessing
+
+from ConstraintSatisfactionProblem import ConstraintSatisfactionProblem
+
+# The problem being solved in a worker process. It is sent to every worker once, when the pool starts, instead
+# of being pickled again for every configuration
+worker_problem = None
+
+
+def initialize_worker(csp):
+    global worker_problem
+    worker_problem = csp
+
+
+# Run one configuration (a dictionary of ConstraintSatisfactionProblem keyword arguments) on the worker's problem
+def solve_configuration(item):
+    i, configuration = item
+    solver = ConstraintSatisfactionProblem(worker_problem, **configuration)
+    return i, solver.backtracking_search()
+
+
+# Returns a list of configurations mixing the heuristics with different seeds
+def default_configurations(seeds=2):
+    configurations = []
+    for seed in range(seeds):
+        for heuristic in ["Degree", "MRV", "dom/wdeg"]:
+            configurations.append({"heuristic": heuristic, "lcv": seed % 2 == 1, "inference": True,
+                                   "iterative": True, "seed": seed})
+        configurations.append({"heuristic": "MRV", "backjumping": True, "nogoods": 10000, "iterative": True,
+                               "restarts": "luby", "seed": seed})
+    return configurations
+
+
+# Runs several solver configurations on the same problem at once in a process pool. The first configuration
+# to finish (with a solution, or with False if there is none) wins, and the other workers are terminated. If every
+# configuration runs out of its time or node budget, search() returns None
+class Portfolio:
+
+    def __init__(self, csp, configurations=None, processes=None):
+        self.csp = csp
+        if configurations is None:
+            configurations = default_configurations()
+        self.configurations = configurations
+        if processes is None:
+            processes = min(len(configurations), multiprocessing.cpu_count())
+        self.processes = processes
+        # The configuration that finished first, and its position in configurations
+        self.winner = None
+        self.winner_index = None
+
+    def search(self):
+        items = list(enumerate(self.configurations))
+        # Leaving the with block terminates the pool, cancelling every configuration that is still running
+        with multiprocessing.Pool(self.processes, initialize_worker, (self.csp,)) as pool:
+            stopped = False
+            for i, result in pool.imap_unordered(solve_configuration, items):
+                # A configuration that ran out of budget has not decided anything
+                if result is None:
+                    stopped = True
+                    continue
+                self.winner_index = i
+                self.winner = self.configurations[i]
+                return result
+        if stopped:
+            return None
+        return False
@@ -0,0 +1,30 @@
+# Written by William Dinauer
+# CS74 Fall 2022
+
+# Statuses a search can end with. The last three mean the search stopped before it could tell whether there is a
+# solution
+SOLVED = "solved"
+UNSATISFIABLE = "unsatisfiable"
+TIME_LIMIT = "time_limit"
+NODE_LIMIT = "node_limit"
+CANCELLED = "cancelled"
+
+
+# The outcome of ConstraintSatisfactionProblem.solve(): the status, the solution (None unless the status is
+# SOLVED) and the solver's statistics
+class SearchResult:
+
+    def __init__(self, status, solution, statistics):
+        self.status = status
+        self.solution = solution
+        self.statistics = statistics
+
+    def solved(self):
+        return self.status == SOLVED
+
+    # Returns True if the search was stopped by a budget or cancelled
+    def interrupted(self):
+        return self.status in [TIME_LIMIT, NODE_LIMIT, CANCELLED]
+
+    def __repr__(self):
+        return "SearchResult(%s, %d nodes)" % (self.status, self.statistics["nodes"])
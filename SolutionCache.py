@@ -0,0 +1,150 @@
+# Written by William Dinauer
+# CS74 Fall 2022
+
+import json
+import os
+from collections import OrderedDict
+
+from ConstraintSatisfactionProblem import ConstraintSatisfactionProblem
+
+
+# Cache of solutions keyed by the fingerprint of the problem (see MapProblem.fingerprint and
+# CircuitProblem.fingerprint), so a problem that is equal to an earlier one up to relabelling reuses its solution,
+# mapped onto the new labels. Problems with no solution are cached too.
+# Solutions are kept in memory, up to size of them, and if directory is given also on disk as one JSON file per
+# problem, up to disk_size files. policy is "lru" to evict the least recently used solution when a tier is full,
+# or "fifo" to evict the oldest one. leaf_limit bounds the work spent labelling graphs canonically
+class SolutionCache:
+
+    def __init__(self, size=1024, directory=None, disk_size=10000, policy="lru", leaf_limit=64):
+        if policy not in ["lru", "fifo"]:
+            raise ValueError("policy must be \"lru\" or \"fifo\"")
+        self.size = size
+        self.directory = directory
+        self.disk_size = disk_size
+        self.policy = policy
+        self.leaf_limit = leaf_limit
+        self.memory = OrderedDict()
+        # Keys of the files on disk, least recently used (or oldest, with "fifo") first. Loaded from the directory
+        # the first time it is needed and kept up to date from then on, so a write does not list the directory
+        self.files = None
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # Returns the cached solution for csp, mapped onto its variables: an assignment, False if the problem is known
+    # to have no solution, or None if it is not in the cache
+    def lookup(self, csp):
+        key, order = csp.fingerprint(self.leaf_limit)
+        return self.find(csp, key, order)
+
+    # Add the solution (an assignment, or False) of csp to the cache
+    def store(self, csp, solution):
+        key, order = csp.fingerprint(self.leaf_limit)
+        self.add(csp, key, order, solution)
+
+    # Return the solution of csp from the cache, or solve it with a ConstraintSatisfactionProblem created with the
+    # given keyword arguments and cache the result. Returns None if the search runs out of budget
+    def solve(self, csp, **options):
+        key, order = csp.fingerprint(self.leaf_limit)
+        solution = self.find(csp, key, order)
+        if solution is None:
+            solution = ConstraintSatisfactionProblem(csp, **options).backtracking_search()
+            # A search stopped by its budget has not found anything to cache
+            if solution is not None:
+                self.add(csp, key, order, solution)
+        return solution
+
+    def find(self, csp, key, order):
+        encoded = None
+        if key in self.memory:
+            encoded = self.memory[key]
+            if self.policy == "lru":
+                self.memory.move_to_end(key)
+            self.hits += 1
+        elif self.directory is not None and os.path.exists(self.path(key)):
+            try:
+                with open(self.path(key), "r") as f:
+                    encoded = json.load(f)["solution"]
+            except (OSError, ValueError, KeyError):
+                self.misses += 1
+                return None
+            if self.policy == "lru":
+                os.utime(self.path(key))
+                self.touch_file(key)
+            self.remember(key, encoded)
+            self.hits += 1
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            return None
+        # No solution is stored as None
+        if encoded is None:
+            return False
+        return csp.decode_solution(encoded, order)
+
+    def add(self, csp, key, order, solution):
+        encoded = None
+        if solution is not False:
+            encoded = csp.encode_solution(solution, order)
+        self.remember(key, encoded)
+        if self.directory is not None:
+            # Write to a temporary file first so readers never see a partial file
+            temporary = self.path(key) + ".tmp"
+            with open(temporary, "w") as f:
+                json.dump({"solution": encoded}, f)
+            os.replace(temporary, self.path(key))
+            self.touch_file(key)
+            self.evict_disk()
+
+    # Keep an encoded solution in memory, evicting the oldest (or least recently used) one if there are too many
+    def remember(self, key, encoded):
+        self.memory[key] = encoded
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.size:
+            self.memory.popitem(last=False)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    # Load the keys of the files on disk, ordered by modification time
+    def load_files(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                path = os.path.join(self.directory, name)
+                files.append((os.path.getmtime(path), name[:-len(".json")]))
+        files.sort()
+        self.files = OrderedDict()
+        for mtime, key in files:
+            self.files[key] = None
+
+    # Move the file of key to the most recently used end of the index, adding it if needed
+    def touch_file(self, key):
+        if self.files is None:
+            self.load_files()
+        self.files[key] = None
+        self.files.move_to_end(key)
+
+    # Remove the files least recently used (or written, with "fifo") once there are more than disk_size
+    def evict_disk(self):
+        if self.files is None:
+            self.load_files()
+        while len(self.files) > self.disk_size:
+            key, _ = self.files.popitem(last=False)
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                # Already removed, by another cache sharing the directory
+                pass
+
+    # Empty the memory tier, and the disk tier too if disk is True
+    def clear(self, disk=False):
+        self.memory.clear()
+        if disk and self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.directory, name))
+            self.files = OrderedDict()
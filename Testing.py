@@ -1,8 +1,11 @@
 # Written by William Dinauer
 # CS74 Fall 2022
 
+import json
+
 from ConstraintSatisfactionProblem.ConstraintSatisfactionProblem import ConstraintSatisfactionProblem
 from ConstraintSatisfactionProblem.MapProblem import MapProblem
+from ConstraintSatisfactionProblem.BatchSolver import solve_instance
 
 # Testing for Large Graph
 large_graph = {0: {40, 46, 120, 134, 146, 180, 203},
@@ -310,3 +313,15 @@ csp = ConstraintSatisfactionProblem(map_problem, "Degree", True, True)
 
 assignment = csp.backtracking_search()
 print(assignment)
+
+# Testing a map instance given as JSON to BatchSolver. The keys of the "graph" object are strings while the
+# neighbour lists hold numbers, and both must name the same vertices
+triangle = {"graph": {"0": [1, 2], "1": [0, 2], "2": [0, 1]}, "colors": 2}
+result = json.loads(json.dumps(solve_instance(0, json.dumps(triangle), {}, None)))
+assert result["status"] == "unsatisfiable"
+triangle["colors"] = 3
+result = json.loads(json.dumps(solve_instance(0, json.dumps(triangle), {}, None)))
+assert result["status"] == "solved"
+assert sorted(result["solution"].keys()) == ["0", "1", "2"]
+assert len(set(result["solution"].values())) == 3
+print(result)
@@ -0,0 +1,74 @@
+# Written by William Dinauer
+# CS74 Fall 2022
+
+import copy
+
+
+# Undo log for the domains used during the search. Before a domain is modified for the first time at a given
+# level, its previous value is pushed onto the trail and the domain is replaced with a shallow copy. Backtracking
+# pops the trail back to a mark and restores the saved domains, so only the domains that actually changed are copied
+class Trail:
+
+    def __init__(self):
+        # (variable, previous domain, level the variable was previously saved at)
+        self.entries = []
+        # Length of entries at the start of every level
+        self.levels = []
+        # Maps a variable to the level at which it was last saved
+        self.saved = {}
+
+    # Start a new level, returning the mark that undo() can roll back to
+    def mark(self):
+        self.levels.append(len(self.entries))
+        return len(self.levels)
+
+    # Save the domain of var before it is modified. Only the first call per variable per level copies the domain
+    def save(self, domains, var):
+        level = len(self.levels)
+        previous = self.saved.get(var)
+        if previous == level:
+            return
+        self.entries.append((var, domains[var], previous))
+        self.saved[var] = level
+        domains[var] = copy.copy(domains[var])
+
+    # Variables whose domains were modified since the given mark (defaults to the current level)
+    def changed(self, mark=None):
+        if mark is None:
+            mark = len(self.levels)
+        if mark == 0:
+            start = 0
+        else:
+            start = self.levels[mark-1]
+        changed = []
+        for i in range(start, len(self.entries)):
+            changed.append(self.entries[i][0])
+        return changed
+
+    # (variable, domain before the change) for every domain modified since the given mark (defaults to the current
+    # level)
+    def saved_domains(self, mark=None):
+        if mark is None:
+            mark = len(self.levels)
+        if mark == 0:
+            start = 0
+        else:
+            start = self.levels[mark-1]
+        saved = []
+        for i in range(start, len(self.entries)):
+            saved.append((self.entries[i][0], self.entries[i][1]))
+        return saved
+
+    # Restore every domain modified since the given mark (defaults to the current level) and drop those levels
+    def undo(self, domains, mark=None):
+        if mark is None:
+            mark = len(self.levels)
+        start = self.levels[mark-1]
+        del self.levels[mark-1:]
+        while len(self.entries) > start:
+            var, domain, previous = self.entries.pop()
+            domains[var] = domain
+            if previous is None:
+                del self.saved[var]
+            else:
+                self.saved[var] = previous
@@ -0,0 +1,94 @@
+# Written by William Dinauer
+# CS74 Fall 2022
+
+import heapq
+
+
+# Priority queue of the unassigned variables for the MRV and Degree heuristics (and for picking the first
+# unassigned variable when there is no heuristic). Entries are pushed whenever the domain size or unassigned degree
+# of a variable changes, and stale entries are skipped when the queue is read (lazy invalidation), so selecting a
+# variable costs O(log n) instead of a scan over every variable. Ties are broken by the rank of each variable in
+# order, exactly as the scan in select_unassigned_variable breaks them. Only the variables of order are indexed, so
+# a search over part of the graph (as in repair()) ignores the rest
+class VariableIndex:
+
+    def __init__(self, heuristic, order, graph, asgnmnt, sizes):
+        self.heuristic = heuristic
+        self.graph = graph
+        self.rank = {}
+        for i in range(len(order)):
+            self.rank[order[i]] = i
+        # Domain sizes and number of unassigned neighbours of every variable
+        self.sizes = sizes
+        self.degrees = {}
+        for var in order:
+            degree = 0
+            for adj in graph[var]:
+                if adj not in asgnmnt:
+                    degree += 1
+            self.degrees[var] = degree
+        # Indexed variables whose assignment has been counted in the degrees
+        self.assigned = set()
+        for var in order:
+            if var in asgnmnt:
+                self.assigned.add(var)
+        self.rebuild(asgnmnt)
+
+    # The heap entry of var with its current key
+    def entry(self, var):
+        if self.heuristic == "MRV":
+            return (self.sizes[var], self.rank[var], var)
+        elif self.heuristic == "Degree":
+            return (self.sizes[var], -self.degrees[var], self.rank[var], var)
+        return (self.rank[var], var)
+
+    # Build the heap again from the unassigned variables, dropping every stale entry
+    def rebuild(self, asgnmnt):
+        self.heap = []
+        for var in self.rank:
+            if var not in asgnmnt:
+                self.heap.append(self.entry(var))
+        heapq.heapify(self.heap)
+
+    # Record the new domain size of var
+    def resize(self, var, size):
+        if var not in self.sizes:
+            return
+        if self.sizes[var] != size:
+            self.sizes[var] = size
+            if self.heuristic is not None and var not in self.assigned:
+                heapq.heappush(self.heap, self.entry(var))
+
+    # Record that var was assigned
+    def assign(self, var):
+        self.assigned.add(var)
+        for adj in self.graph[var]:
+            if adj not in self.degrees:
+                continue
+            self.degrees[adj] -= 1
+            if self.heuristic == "Degree" and adj not in self.assigned:
+                heapq.heappush(self.heap, self.entry(adj))
+
+    # Record that var is unassigned again
+    def unassign(self, var):
+        self.assigned.discard(var)
+        for adj in self.graph[var]:
+            if adj not in self.degrees:
+                continue
+            self.degrees[adj] += 1
+            if self.heuristic == "Degree" and adj not in self.assigned:
+                heapq.heappush(self.heap, self.entry(adj))
+        heapq.heappush(self.heap, self.entry(var))
+
+    # Return the unassigned variable chosen by the heuristic, or None if every variable is assigned
+    def select(self, asgnmnt):
+        # Stale entries pile up as domains change, so compact the heap once they outnumber the variables
+        if len(self.heap) > 4 * len(self.rank) + 64:
+            self.rebuild(asgnmnt)
+        while len(self.heap) > 0:
+            entry = self.heap[0]
+            var = entry[-1]
+            if var not in asgnmnt and entry == self.entry(var):
+                return var
+            heapq.heappop(self.heap)
+        return None
@@ -0,0 +1,168 @@
+# Written by William Dinauer
+# CS74 Fall 2022
+
+import numpy as np
+
+from CircuitProblem import CircuitProblem
+
+
+# Circuit problem that builds, once, a NumPy boolean compatibility matrix between the placements of every pair of
+# components. Each domain is a sorted array of placement ids (position*2 + rotation), so update_domains,
+# constrained, numeric_overlap and support are vectorized reductions instead of loops over [position, rotation]
+# pairs. The assignments found are the same as with CircuitProblem, and the order between same-shaped components
+# (with symmetry) is built into the matrices.
+# The matrices take one byte per pair of placements; estimate_table_bytes() gives the cost before building them
+class VectorCircuitProblem(CircuitProblem):
+
+    def __init__(self, m, n, variables, symmetry=False):
+        super().__init__(m, n, variables, symmetry)
+
+        # Placement ids that fit on the board for every component, the row of each id in its matrices, and the
+        # rectangle bounds of every valid placement, used to build the matrices
+        self.ids = {}
+        self.rows = {}
+        self.bounds = {}
+        for var in range(self.num_variables):
+            self.index_placements(var)
+
+        # compatible[var][adj][i, j] is True if placement i of var and placement j of adj do not overlap. Only one
+        # matrix is built per pair of components; the other direction is a transposed view of it
+        self.compatible = {}
+        self.table_bytes = 0
+        for var in range(self.num_variables):
+            self.compatible[var] = {}
+        for var in range(self.num_variables):
+            for adj in range(var+1, self.num_variables):
+                self.build_table(var, adj)
+
+    # The matrices of a new component are built against every component already there
+    def add_component(self, component):
+        changed = super().add_component(component)
+        var = self.num_variables - 1
+        self.index_placements(var)
+        self.compatible[var] = {}
+        for adj in range(var):
+            self.build_table(adj, var)
+        return changed
+
+    # Find the placement ids of var that fit on the board, their rows and their bounds
+    def index_placements(self, var):
+        ids = []
+        for i in range(len(self.domain_values)):
+            if self.masks[var][i] is not None:
+                ids.append(i)
+        self.ids[var] = np.array(ids, dtype=np.int64)
+        self.rows[var] = np.full(len(self.domain_values), -1, dtype=np.int64)
+        self.rows[var][self.ids[var]] = np.arange(len(ids))
+        self.bounds[var] = self.placement_bounds(var, self.ids[var])
+
+    # Build the matrix between var and adj, where var < adj
+    def build_table(self, var, adj):
+        ax0, ay0, ax1, ay1 = self.bounds[var]
+        bx0, by0, bx1, by1 = self.bounds[adj]
+        overlap = ((ax0[:, None] < bx1[None, :]) & (bx0[None, :] < ax1[:, None]) &
+                   (ay0[:, None] < by1[None, :]) & (by0[None, :] < ay1[:, None]))
+        table = ~overlap
+        # Same-shaped components must also be placed in increasing order of their keys
+        if adj in self.same_shape[var]:
+            keys = np.array(self.keys[var])[self.ids[var]]
+            adj_keys = np.array(self.keys[adj])[self.ids[adj]]
+            table &= keys[:, None] < adj_keys[None, :]
+        self.compatible[var][adj] = table
+        self.compatible[adj][var] = table.T
+        self.table_bytes += table.nbytes
+
+    # Return arrays of the left, bottom, right and top edges (exclusive) of the given placement ids of var
+    def placement_bounds(self, var, ids):
+        pos = ids // 2
+        rotation = ids % 2
+        x0 = pos % self.n
+        y0 = pos // self.n
+        width = np.where(rotation == 0, self.x[var], self.y[var])
+        height = np.where(rotation == 0, self.y[var], self.x[var])
+        return x0, y0, x0 + width, y0 + height
+
+    # Number of bytes the compatibility matrices would take for the given board and components
+    @staticmethod
+    def estimate_table_bytes(m, n, variables):
+        counts = []
+        for component in variables:
+            y = len(component)
+            x = len(component[0])
+            count = max(n-x+1, 0) * max(m-y+1, 0) + max(n-y+1, 0) * max(m-x+1, 0)
+            counts.append(count)
+        total = 0
+        for var in range(len(counts)):
+            for adj in range(var+1, len(counts)):
+                total += counts[var] * counts[adj]
+        return total
+
+    def initialize_domains(self):
+        domains = {}
+        for var in range(self.num_variables):
+            domains[var] = self.initial_domain(var)
+        return domains
+
+    def initial_domain(self, var):
+        return self.ids[var].copy()
+
+    # The id of the [position, rotation] pair
+    def placement_id(self, pair):
+        return pair[0]*2 + pair[1]
+
+    # Row of var's compatibility matrices for pair, restricted to the columns of the placements left in domain
+    def compatible_with(self, var, pair, adj, domain):
+        row = self.rows[var][self.placement_id(pair)]
+        return self.compatible[var][adj][row, self.rows[adj][domain]]
+
+    def domain_size(self, domain):
+        return len(domain)
+
+    def domain_key(self, domain):
+        return domain.tobytes()
+
+    def domain_list(self, domain):
+        values = []
+        for i in domain.tolist():
+            values.append(self.domain_values[i])
+        return values
+
+    def in_domain(self, val, domain):
+        i = self.placement_id(val)
+        index = np.searchsorted(domain, i)
+        return index < len(domain) and domain[index] == i
+
+    def prune(self, var, values, domains, trail=None):
+        ids = []
+        for val in values:
+            ids.append(self.placement_id(val))
+        if trail is not None:
+            trail.save(domains, var)
+        domains[var] = domains[var][~np.isin(domains[var], ids)]
+
+    # Keep only the placements of unplaced components that are compatible with the new placement of var. Earlier
+    # placements have already filtered the domains
+    def update_domains(self, var, asgnmnt, domains, trail=None):
+        pair = asgnmnt[var]
+        for adj in domains:
+            if adj not in asgnmnt:
+                keep = self.compatible_with(var, pair, adj, domains[adj])
+                if not keep.all():
+                    if trail is not None:
+                        trail.save(domains, adj)
+                    domains[adj] = domains[adj][keep]
+        return domains
+
+    def numeric_overlap(self, var, adj, asgnmnt, domains):
+        keep = self.compatible_with(var, asgnmnt[var], adj, domains[adj])
+        return -(len(keep) - int(np.count_nonzero(keep)))
+
+    def constrained(self, var, val, adj, domains):
+        return bool(self.compatible_with(var, val, adj, domains[adj]).any())
+
+    def support(self, var, val, adj, domains):
+        keep = self.compatible_with(var, val, adj, domains[adj])
+        if not keep.any():
+            return None
+        index = int(np.argmax(keep))
+        return self.domain_values[int(domains[adj][index])]